@@ -1,10 +1,29 @@
 -- Add similarity search function for RAG pipeline
 -- This function finds fashion trends similar to a query embedding
+-- (the one canonical definition; safe to re-run on an existing database)
+--
+-- Learning Notes:
+-- - pgvector's ivfflat/HNSW indexes serve "ORDER BY embedding <=> query
+--   LIMIT n". A WHERE on the computed similarity sits between that scan and
+--   the LIMIT: the distance is computed again per row, rows under the
+--   threshold keep the scan going, and the planner (which can't estimate
+--   how many rows pass) may fall back to a sequential scan
+-- - So the n nearest rows come from the index first, and the similarity
+--   threshold is applied to those rows afterwards
+-- - match_threshold is a cosine similarity (0..1), not a distance
+-- - probes (ivfflat) / ef_search (HNSW) trade recall for speed per call;
+--   NULL keeps the server setting. set_config(..., true) only lasts until
+--   the end of the transaction PostgREST opens for this call
+
+-- The older three-argument version would make calls ambiguous
+DROP FUNCTION IF EXISTS match_fashion_trends(vector, float, int);
 
 CREATE OR REPLACE FUNCTION match_fashion_trends(
   query_embedding vector(1536),
-  match_threshold float DEFAULT 0.7,
-  match_count int DEFAULT 5
+  match_threshold float DEFAULT 0.3,
+  match_count int DEFAULT 5,
+  probes int DEFAULT NULL,
+  ef_search int DEFAULT NULL
 )
 RETURNS TABLE (
   id uuid,
@@ -18,20 +37,39 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+  IF probes IS NOT NULL THEN
+    PERFORM set_config('ivfflat.probes', probes::text, true);
+  END IF;
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+
   RETURN QUERY
   SELECT
-    fashion_embeddings.id,
-    fashion_embeddings.content,
-    fashion_embeddings.title,
-    fashion_embeddings.category,
-    fashion_embeddings.season,
-    fashion_embeddings.metadata,
-    1 - (fashion_embeddings.embedding <=> query_embedding) AS similarity
-  FROM fashion_embeddings
-  WHERE 1 - (fashion_embeddings.embedding <=> query_embedding) > match_threshold
-  ORDER BY fashion_embeddings.embedding <=> query_embedding
-  LIMIT match_count;
+    nearest.id,
+    nearest.content,
+    nearest.title,
+    nearest.category,
+    nearest.season,
+    nearest.metadata,
+    1 - nearest.distance AS similarity
+  FROM (
+    -- The distance is computed once, by the index scan that orders the rows
+    SELECT
+      fashion_embeddings.id,
+      fashion_embeddings.content,
+      fashion_embeddings.title,
+      fashion_embeddings.category,
+      fashion_embeddings.season,
+      fashion_embeddings.metadata,
+      fashion_embeddings.embedding <=> query_embedding AS distance
+    FROM fashion_embeddings
+    ORDER BY distance
+    LIMIT match_count
+  ) AS nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY nearest.distance;
 END;
 $$;
 
-COMMENT ON FUNCTION match_fashion_trends IS 'Performs vector similarity search to find fashion trends similar to a query';
+COMMENT ON FUNCTION match_fashion_trends(vector, float, int, int, int) IS 'Index-driven vector similarity search: nearest trends first, similarity threshold applied afterwards';
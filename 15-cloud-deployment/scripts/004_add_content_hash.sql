@@ -0,0 +1,23 @@
+-- Add a content hash so create_embeddings.py only embeds new or changed trends
+-- Run this after 002_create_embeddings_table.sql
+
+-- SHA-256 (hex) of the embedded content string
+ALTER TABLE fashion_embeddings
+  ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Backfill rows written before this migration
+UPDATE fashion_embeddings
+SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')
+WHERE content_hash IS NULL;
+
+-- Earlier runs inserted the same content more than once; keep the oldest copy
+DELETE FROM fashion_embeddings a
+USING fashion_embeddings b
+WHERE a.content_hash = b.content_hash
+  AND (a.created_at, a.id) > (b.created_at, b.id);
+
+-- Upserts use this as their conflict target
+CREATE UNIQUE INDEX IF NOT EXISTS fashion_embeddings_content_hash_idx
+ON fashion_embeddings (content_hash);
+
+COMMENT ON COLUMN fashion_embeddings.content_hash IS 'SHA-256 of content; identifies a trend across ingestion runs';
@@ -0,0 +1,76 @@
+-- Denormalised title/category/season columns: populated on ingest, indexed,
+-- and usable as filters in vector search
+-- Run this after 004_add_content_hash.sql
+
+-- Rows written before create_embeddings.py filled these columns kept them
+-- only inside metadata
+UPDATE fashion_embeddings
+SET
+  title = COALESCE(title, NULLIF(metadata->>'title', '')),
+  category = COALESCE(category, NULLIF(metadata->>'category', '')),
+  season = COALESCE(season, NULLIF(metadata->>'season', ''))
+WHERE title IS NULL OR category IS NULL OR season IS NULL;
+
+-- Partial B-tree indexes: rows without a value are never filtered on
+CREATE INDEX IF NOT EXISTS fashion_embeddings_category_season_idx
+ON fashion_embeddings (category, season)
+WHERE category IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS fashion_embeddings_season_idx
+ON fashion_embeddings (season)
+WHERE season IS NOT NULL;
+
+ANALYZE fashion_embeddings;
+
+-- Vector search restricted to a category and/or season (NULL = any)
+--
+-- The filter runs first (MATERIALIZED keeps Postgres from pushing it below
+-- the ANN index scan), so distances are only computed for matching rows and
+-- a selective filter can't leave the approximate index with too few results.
+-- The price is an exact scan of the filtered rows, so keep filters selective.
+CREATE OR REPLACE FUNCTION match_fashion_trends_filtered(
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.3,
+  match_count int DEFAULT 5,
+  filter_category text DEFAULT NULL,
+  filter_season text DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  content text,
+  title text,
+  category text,
+  season text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE sql STABLE
+AS $$
+  WITH candidates AS MATERIALIZED (
+    SELECT
+      fashion_embeddings.id,
+      fashion_embeddings.content,
+      fashion_embeddings.title,
+      fashion_embeddings.category,
+      fashion_embeddings.season,
+      fashion_embeddings.metadata,
+      fashion_embeddings.embedding <=> query_embedding AS distance
+    FROM fashion_embeddings
+    WHERE (filter_category IS NULL OR fashion_embeddings.category = filter_category)
+      AND (filter_season IS NULL OR fashion_embeddings.season = filter_season)
+  )
+  SELECT
+    candidates.id,
+    candidates.content,
+    candidates.title,
+    candidates.category,
+    candidates.season,
+    candidates.metadata,
+    1 - candidates.distance AS similarity
+  FROM candidates
+  WHERE 1 - candidates.distance > match_threshold
+  ORDER BY candidates.distance
+  LIMIT match_count;
+$$;
+
+COMMENT ON FUNCTION match_fashion_trends_filtered(vector, float, int, text, text) IS 'Vector similarity search over trends of one category and/or season';
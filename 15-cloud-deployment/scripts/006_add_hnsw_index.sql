@@ -0,0 +1,27 @@
+-- Replace the ivfflat index from 002_create_embeddings_table.sql with HNSW
+-- Run this after 005_add_trend_filters.sql (needs pgvector 0.5.0 or newer)
+--
+-- Learning Notes:
+-- - The ivfflat index was created on an empty table, so its lists (cluster
+--   centroids) don't describe the data and recall falls as rows are added
+-- - HNSW builds a graph that new rows join on insert, so it needs no
+--   rebuild as the table grows and has better recall at the same latency
+-- - m = links per node, ef_construction = candidates kept while building;
+--   higher values give better recall but slower builds and a bigger index
+-- - At query time hnsw.ef_search (default 40, at least match_count) sets
+--   recall; match_fashion_trends takes it per call
+-- - This version blocks writes while it builds. To rebuild without that,
+--   or with other m / ef_construction values, use maintain_index.py
+
+SET maintenance_work_mem = '512MB';
+
+CREATE INDEX IF NOT EXISTS fashion_embeddings_embedding_hnsw_idx
+ON fashion_embeddings
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+DROP INDEX IF EXISTS fashion_embeddings_embedding_idx;
+
+RESET maintenance_work_mem;
+
+ANALYZE fashion_embeddings;
@@ -0,0 +1,71 @@
+-- Vector search for many query embeddings in one call
+-- Run this after 006_add_hnsw_index.sql
+--
+-- Learning Notes:
+-- - Batch jobs (precomputation, evaluation) used to make one
+--   match_fashion_trends RPC per query; this takes them all at once and
+--   saves a network round trip per query
+-- - unnest(...) WITH ORDINALITY numbers the queries, and the LATERAL
+--   subquery runs the same index-driven "ORDER BY distance LIMIT n" search
+--   as match_fashion_trends once per query
+-- - query_index is 0-based, so it lines up with the caller's list
+-- - Send each embedding in pgvector's text form ('[0.1,0.2,...]'): a JSON
+--   array of arrays would be read as a two-dimensional array of numbers
+
+CREATE OR REPLACE FUNCTION match_fashion_trends_batch(
+  query_embeddings vector(1536)[],
+  match_threshold float DEFAULT 0.3,
+  match_count int DEFAULT 5,
+  probes int DEFAULT NULL,
+  ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+  query_index int,
+  id uuid,
+  content text,
+  title text,
+  category text,
+  season text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF probes IS NOT NULL THEN
+    PERFORM set_config('ivfflat.probes', probes::text, true);
+  END IF;
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    (queries.ordinality - 1)::int AS query_index,
+    nearest.id,
+    nearest.content,
+    nearest.title,
+    nearest.category,
+    nearest.season,
+    nearest.metadata,
+    1 - nearest.distance AS similarity
+  FROM unnest(query_embeddings) WITH ORDINALITY AS queries(embedding, ordinality)
+  CROSS JOIN LATERAL (
+    SELECT
+      fashion_embeddings.id,
+      fashion_embeddings.content,
+      fashion_embeddings.title,
+      fashion_embeddings.category,
+      fashion_embeddings.season,
+      fashion_embeddings.metadata,
+      fashion_embeddings.embedding <=> queries.embedding AS distance
+    FROM fashion_embeddings
+    ORDER BY distance
+    LIMIT match_count
+  ) AS nearest
+  WHERE 1 - nearest.distance > match_threshold
+  ORDER BY queries.ordinality, nearest.distance;
+END;
+$$;
+
+COMMENT ON FUNCTION match_fashion_trends_batch(vector[], float, int, int, int) IS 'match_fashion_trends for an array of query embeddings; rows are tagged with the 0-based query_index';
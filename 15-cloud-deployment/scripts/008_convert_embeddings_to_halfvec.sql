@@ -0,0 +1,76 @@
+-- Optional: store embeddings at half precision (halfvec) instead of vector
+-- Run this after 007_add_batch_similarity_function.sql (needs pgvector
+-- 0.7.0 or newer), then set EMBEDDING_STORAGE=halfvec for the Python code
+--
+-- Learning Notes:
+-- - vector stores 4-byte floats, halfvec 2-byte floats: a 1536-dimension
+--   embedding drops from ~6 KB to ~3 KB, and so does every index entry, so
+--   more of the table and index stay in Postgres' cache
+-- - float16 keeps about 3 significant digits; cosine rankings of ada-002
+--   embeddings barely move (benchmark_pgvector.py --storage measures it)
+-- - ALTER COLUMN ... TYPE rewrites the table and blocks writes while it
+--   runs; the ANN index is rebuilt with the halfvec operator class
+-- - The search functions keep the bodies 003/005/007 define; only their
+--   vector parameters become halfvec (a vector overload next to a halfvec
+--   one would make PostgREST calls ambiguous, so the old one is dropped).
+--   Clients send the same JSON, PostgREST casts it
+-- - Safe to re-run: after re-applying 003, 005 or 007 on a halfvec table,
+--   run this again to swap the vector signatures they create
+-- - To undo: drop the halfvec functions, ALTER COLUMN embedding TYPE
+--   vector(1536), rebuild the index with vector_cosine_ops and re-run 003,
+--   005 and 007 (the lost precision doesn't come back)
+
+DO $$
+BEGIN
+  -- Skipped when re-run: converting again would rewrite the table for nothing
+  IF (SELECT atttypid FROM pg_attribute
+      WHERE attrelid = 'fashion_embeddings'::regclass AND attname = 'embedding') = 'vector'::regtype THEN
+    DROP INDEX IF EXISTS fashion_embeddings_embedding_idx;
+    DROP INDEX IF EXISTS fashion_embeddings_embedding_hnsw_idx;
+    DROP INDEX IF EXISTS fashion_embeddings_embedding_ivfflat_idx;
+
+    ALTER TABLE fashion_embeddings
+    ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+  END IF;
+END;
+$$;
+
+SET maintenance_work_mem = '512MB';
+
+CREATE INDEX IF NOT EXISTS fashion_embeddings_embedding_hnsw_idx
+ON fashion_embeddings
+USING hnsw (embedding halfvec_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+RESET maintenance_work_mem;
+
+ANALYZE fashion_embeddings;
+
+-- Recreate the functions from 003, 005 and 007 with halfvec parameters:
+-- the definition is read back from the catalog and only its argument list
+-- (the first line) is changed
+DO $$
+DECLARE
+  fn record;
+  definition text;
+  signature text;
+BEGIN
+  FOR fn IN
+    SELECT p.oid, obj_description(p.oid, 'pg_proc') AS description
+    FROM pg_proc p
+    WHERE p.proname IN ('match_fashion_trends', 'match_fashion_trends_filtered', 'match_fashion_trends_batch')
+      AND p.pronamespace = current_schema()::regnamespace
+      AND p.proargtypes::oid[] && ARRAY['vector'::regtype, 'vector[]'::regtype]::oid[]
+  LOOP
+    definition := pg_get_functiondef(fn.oid);
+    signature := regexp_replace(fn.oid::regprocedure::text, '\mvector\M', 'halfvec', 'g');
+
+    EXECUTE format('DROP FUNCTION %s', fn.oid::regprocedure);
+    EXECUTE regexp_replace(split_part(definition, E'\n', 1), '\mvector\M', 'halfvec', 'g')
+      || substr(definition, length(split_part(definition, E'\n', 1)) + 1);
+    EXECUTE format('COMMENT ON FUNCTION %s IS %L', signature, fn.description);
+  END LOOP;
+END;
+$$;
+
+COMMENT ON COLUMN fashion_embeddings.embedding IS 'ada-002 embedding stored at half precision (halfvec)';
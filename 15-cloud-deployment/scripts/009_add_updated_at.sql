@@ -0,0 +1,44 @@
+-- Track when each trend row last changed, so the API's local search index
+-- can pick up re-embedded trends as well as new ones
+-- Run this after 007_add_batch_similarity_function.sql (or the optional 008)
+--
+-- Learning Notes:
+-- - The upsert writers update content/embedding in place on conflict and
+--   keep the original created_at, so polling on created_at never sees them
+-- - The trigger stamps updated_at on every UPDATE, including the DO UPDATE
+--   branch of INSERT ... ON CONFLICT (PostgREST upserts and COPY loads)
+-- - The (updated_at, id) index serves the index's "updated_at >= watermark
+--   ORDER BY updated_at, id" poll
+
+ALTER TABLE fashion_embeddings
+  ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+
+-- Rows written before this migration last changed when they were created
+UPDATE fashion_embeddings
+SET updated_at = COALESCE(created_at, NOW())
+WHERE updated_at IS NULL;
+
+ALTER TABLE fashion_embeddings
+  ALTER COLUMN updated_at SET DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION set_fashion_embeddings_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS fashion_embeddings_set_updated_at ON fashion_embeddings;
+
+CREATE TRIGGER fashion_embeddings_set_updated_at
+BEFORE UPDATE ON fashion_embeddings
+FOR EACH ROW
+EXECUTE FUNCTION set_fashion_embeddings_updated_at();
+
+CREATE INDEX IF NOT EXISTS fashion_embeddings_updated_at_idx
+ON fashion_embeddings (updated_at, id);
+
+COMMENT ON COLUMN fashion_embeddings.updated_at IS 'Last insert or update of the row; watermark for the local search index';
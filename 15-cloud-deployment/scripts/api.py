@@ -3,12 +3,15 @@
 This file creates a FastAPI application with endpoints for Step 11.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 import uvicorn
 
+from rate_limiter import scheduler_status
+from tracing import recent_trace_dicts, start_trace, stage_metrics
+
 
 try:
     from ollama_client import generate_journal_prompt
@@ -17,6 +20,19 @@ except Exception as e:
     print(f"Warning: Ollama client not available: {e}")
     OLLAMA_AVAILABLE = False
 
+try:
+    from rag_pipeline import RAGPipeline, VECTOR_BACKEND, get_vector_store
+    rag_pipeline = RAGPipeline()
+    RAG_AVAILABLE = True
+except Exception as e:
+    print(f"Warning: RAG pipeline not available: {e}")
+    RAG_AVAILABLE = False
+
+# Largest number of queries accepted by one batch recommendations request
+MAX_BATCH_QUERIES = 50
+# Most trends one query may retrieve (passed to the RPC as match_count)
+MAX_RECOMMENDATION_LIMIT = 20
+
 # Create FastAPI app
 app = FastAPI(
     title="Style Journal API - Step 11",
@@ -47,6 +63,42 @@ class JournalPromptResponse(BaseModel):
     model: str
 
 
+class RecommendationRequest(BaseModel):
+    """Request model for fashion recommendations"""
+    query: str
+    limit: int = Field(5, ge=1, le=MAX_RECOMMENDATION_LIMIT)
+    category: Optional[str] = None  # Only recommend from this category
+    season: Optional[str] = None    # Only recommend from this season
+
+
+class RecommendationResponse(BaseModel):
+    """Response model for fashion recommendations"""
+    query: str
+    retrieved_trends: list
+    recommendations: str
+    context_stats: Optional[dict] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    """Request model for batch fashion recommendations"""
+    queries: List[str]
+    limit: int = Field(5, ge=1, le=MAX_RECOMMENDATION_LIMIT)
+
+
+class BatchRecommendationResponse(BaseModel):
+    """Response model for batch fashion recommendations"""
+    results: List[RecommendationResponse]
+    count: int
+
+
+def circuit_status() -> list:
+    """Current state of the RAG pipeline's circuit breakers"""
+    if not RAG_AVAILABLE:
+        return []
+    from rag_pipeline import openai_breaker, supabase_breaker
+    return [openai_breaker.status(), supabase_breaker.status()]
+
+
 # --- API Endpoints ---
 
 @app.get("/")
@@ -58,7 +110,11 @@ def root():
         "endpoints": {
             "GET /api/trends": "Get fashion trends (for Step 11 Task 1: GET request)",
             "POST /api/generate-journal-prompt": "Generate journal prompts (for Step 11 Task 2: POST request)",
-            "POST /api/scrape-trends": "Trigger daily trend scraping (for Step 13: Automation with n8n)"
+            "POST /api/scrape-trends": "Trigger daily trend scraping (for Step 13: Automation with n8n)",
+            "POST /api/recommendations": "Get AI-powered fashion recommendations using RAG",
+            "POST /api/recommendations/batch": "Get recommendations for many queries in one request",
+            "GET /api/metrics": "Per-stage RAG latency histograms and recent request traces",
+            "POST /api/index/refresh": "Load newly stored trends into the local search index"
         }
     }
 
@@ -69,7 +125,9 @@ def health_check():
     return {
         "status": "healthy",
         "message": "FastAPI backend is running",
-        "ollama_available": OLLAMA_AVAILABLE
+        "ollama_available": OLLAMA_AVAILABLE,
+        "rag_available": RAG_AVAILABLE,
+        "circuits": circuit_status()
     }
 
 
@@ -201,6 +259,119 @@ def scrape_trends():
     }
 
 
+@app.post("/api/recommendations", response_model=RecommendationResponse)
+def get_recommendations(request: RecommendationRequest, response: Response):
+    """
+    Step 9: AI Stylist - Get personalized fashion recommendations using RAG
+    
+    Example request body:
+    {
+        "query": "I want a casual summer outfit for a beach party",
+        "limit": 5
+    }
+    """
+    if not RAG_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline not available. Please check OpenAI API key and Supabase connection."
+        )
+    
+    try:
+        with start_trace() as trace:
+            result = rag_pipeline.get_recommendations(
+                request.query,
+                limit=request.limit,
+                category=request.category,
+                season=request.season
+            )
+        response.headers["Server-Timing"] = trace.server_timing()
+        return RecommendationResponse(**result)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate recommendations: {str(e)}"
+        )
+
+
+@app.post("/api/recommendations/batch", response_model=BatchRecommendationResponse)
+def get_recommendations_batch(request: BatchRecommendationRequest, response: Response):
+    """
+    Batch recommendations for offline jobs such as newsletter segments.
+    All queries share one embeddings call and one vector search.
+    
+    Example request body:
+    {
+        "queries": ["minimalist work outfit", "bold summer festival look"],
+        "limit": 5
+    }
+    """
+    if not RAG_AVAILABLE:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG pipeline not available. Please check OpenAI API key and Supabase connection."
+        )
+    
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: send at most {MAX_BATCH_QUERIES} per batch"
+        )
+    
+    try:
+        with start_trace() as trace:
+            results = rag_pipeline.get_recommendations_batch(request.queries, limit=request.limit)
+        response.headers["Server-Timing"] = trace.server_timing()
+        return BatchRecommendationResponse(
+            results=[RecommendationResponse(**result) for result in results],
+            count=len(results)
+        )
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate batch recommendations: {str(e)}"
+        )
+
+
+@app.get("/api/metrics")
+def get_metrics():
+    """
+    Per-stage latency histograms for the RAG pipeline
+    (embedding, retrieval, augment, generation), plus the spans and
+    payload-size attributes of the last few requests
+    """
+    return {
+        "stages": stage_metrics.snapshot(),
+        "recent_traces": recent_trace_dicts(),
+        "generation_backends": rag_pipeline.generation_router.status() if RAG_AVAILABLE else [],
+        "circuits": circuit_status(),
+        "local_index": rag_pipeline.local_index.status() if RAG_AVAILABLE and rag_pipeline.local_index else None,
+        "rate_limits": scheduler_status(),
+        "vector_store": get_vector_store().status() if RAG_AVAILABLE and VECTOR_BACKEND == "postgres" else None,
+        "unit": "ms"
+    }
+
+
+@app.post("/api/index/refresh")
+def refresh_index():
+    """
+    Pull newly stored trend embeddings into the local search index now
+    instead of waiting for the next poll (called by the ingestion workflow)
+    """
+    if not RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail="RAG pipeline not available")
+    try:
+        index = rag_pipeline.get_local_index()
+        appended = index.refresh()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to refresh the index: {str(e)}"
+        )
+    return {"appended": appended, "rows": len(index)}
+
+
 @app.get("/api/ollama/status")
 def ollama_status():
     """Check if Ollama is available and running"""
@@ -0,0 +1,157 @@
+"""
+RAG Pipeline Benchmark
+Measures RAGPipeline.get_recommendations latency and throughput under
+concurrent load, fully offline, against the local stand-in services
+
+Usage:
+    python benchmark_rag.py
+    python benchmark_rag.py --rows 1000,10000,100000,1000000 --dimensions 256
+    python benchmark_rag.py --concurrency 16 --requests 500 --output results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+
+import numpy as np
+
+from stub_services import StubConfig, SyntheticCorpus, start_stub_server, STUB_API_KEY
+
+QUERY_TEMPLATES = [
+    "I want a minimalist spring outfit for work",
+    "Bold summer festival look with bright colors",
+    "Cozy layered autumn streetwear",
+    "Elegant evening outfit for a winter wedding",
+    "Sustainable everyday basics for a capsule wardrobe",
+    "Y2K inspired party outfit",
+]
+
+
+def latency_summary(latencies_ms: List[float], wall_seconds: float) -> Dict:
+    """
+    p50/p95/p99 latency and throughput for one load run
+    """
+    values = np.array(latencies_ms)
+    return {
+        "requests": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1),
+        "throughput_rps": round(len(values) / wall_seconds, 2)
+    }
+
+
+def build_queries(count: int, repeat: bool) -> List[str]:
+    """
+    Unique queries by default so the embedding cache doesn't hide API latency
+    """
+    queries = []
+    for i in range(count):
+        template = QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)]
+        queries.append(template if repeat else f"{template} (variant {i})")
+    return queries
+
+
+def run_load(pipeline, queries: List[str], concurrency: int, verbose: bool = False) -> Dict:
+    """
+    Fire every query at the pipeline from `concurrency` worker threads
+    """
+    def timed_request(query: str) -> float:
+        start = time.perf_counter()
+        pipeline.get_recommendations(query)
+        return (time.perf_counter() - start) * 1000
+
+    # The pipeline prints a few lines per request; hide them unless asked
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed_request, queries))
+        wall_seconds = time.perf_counter() - start
+
+    return latency_summary(latencies, wall_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG pipeline benchmark")
+    parser.add_argument("--rows", default="1000,10000,100000",
+                        help="Comma-separated synthetic corpus sizes (e.g. 1000,10000,100000,1000000)")
+    parser.add_argument("--dimensions", type=int, default=1536,
+                        help="Embedding size; lower it for 1M-row corpora on small machines")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--rpc-latency-ms", type=float, default=10)
+    parser.add_argument("--repeat-queries", action="store_true",
+                        help="Reuse a handful of queries (exercises the embedding cache)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        embedding_latency_ms=args.embedding_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        rpc_latency_ms=args.rpc_latency_ms
+    )
+    server = start_stub_server(config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # rag_pipeline reads its configuration at import time
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-stub"
+    os.environ["SUPABASE_URL"] = base_url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = STUB_API_KEY
+    os.environ["RAG_GENERATION_BACKENDS"] = "openai"
+
+    from rag_pipeline import RAGPipeline
+    from tracing import stage_metrics
+
+    print("=" * 78)
+    print("RAG Pipeline Benchmark (offline stand-ins)")
+    print("=" * 78)
+    print(f"Stand-in latency: embeddings {args.embedding_latency_ms}ms, "
+          f"chat {args.chat_latency_ms}ms, rpc {args.rpc_latency_ms}ms")
+    print(f"Load: {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.dimensions} dimensions\n")
+    print(f"{'rows':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}   stage avg ms")
+
+    results = []
+    for rows in [int(value) for value in args.rows.split(",") if value]:
+        config.corpus = SyntheticCorpus(rows, args.dimensions)
+        pipeline = RAGPipeline()
+
+        run_load(pipeline, build_queries(args.warmup, True), args.concurrency)
+        stage_metrics.reset()
+
+        summary = run_load(
+            pipeline,
+            build_queries(args.requests, args.repeat_queries),
+            args.concurrency,
+            args.verbose
+        )
+        stages = {name: stage["avg_ms"] for name, stage in stage_metrics.snapshot().items()}
+        summary.update({"rows": rows, "stage_avg_ms": stages})
+        results.append(summary)
+
+        stage_text = ", ".join(f"{name} {value}" for name, value in stages.items())
+        print(f"{rows:>10} {summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9} "
+              f"{summary['max_ms']:>9} {summary['throughput_rps']:>8}   {stage_text}")
+
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Embedding Checkpoints
+Remembers which trends of an input file were already embedded and stored,
+so an interrupted run can resume instead of starting over
+
+Learning Notes:
+- State lives in a local SQLite file: one row per (input file, content hash)
+- A hash is only recorded after its row was written to Supabase, so a
+  crash can at worst redo the last unflushed chunk (upserts make that safe)
+- Checking a hash is a local lookup; no API or database round trip
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from embedding_writer import content_hash
+
+DEFAULT_CHECKPOINT_PATH = ".embedding_checkpoint.sqlite"
+
+
+class EmbeddingCheckpoint:
+    """
+    Per-input progress for create_embeddings.py
+
+    Usage:
+        checkpoint = EmbeddingCheckpoint(".embedding_checkpoint.sqlite", "scraped_trends.json")
+        checkpoint.start(resume=True)
+        ...
+        checkpoint.mark_done(hashes)
+        checkpoint.finish()
+    """
+
+    def __init__(self, path: str, input_file: str):
+        self.path = path
+        # Keyed by the absolute path; content hashes stay valid if the file changes
+        self.input_key = os.path.abspath(input_file)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS done ("
+            " input_key TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " PRIMARY KEY (input_key, content_hash))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " input_key TEXT PRIMARY KEY,"
+            " started_at TEXT,"
+            " updated_at TEXT,"
+            " finished_at TEXT)"
+        )
+        self.connection.commit()
+        self.resumed = 0
+        self.recorded = 0
+
+    def start(self, resume: bool) -> int:
+        """
+        Begin a run; without `resume` earlier progress for this input is
+        cleared. Returns how many trends are already done.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            if resume:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, NULL)", (self.input_key, now, now)
+                )
+                self.connection.execute(
+                    "UPDATE runs SET updated_at = ?, finished_at = NULL WHERE input_key = ?",
+                    (now, self.input_key)
+                )
+            else:
+                self.connection.execute("DELETE FROM done WHERE input_key = ?", (self.input_key,))
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, NULL)", (self.input_key, now, now)
+                )
+            self.connection.commit()
+            return self.done_count()
+
+    def done_count(self) -> int:
+        row = self.connection.execute(
+            "SELECT COUNT(*) FROM done WHERE input_key = ?", (self.input_key,)
+        ).fetchone()
+        return row[0]
+
+    def done_hashes(self, hashes: List[str]) -> set:
+        """
+        Which of `hashes` are already recorded for this input
+        """
+        found = set()
+        with self.lock:
+            # SQLite allows 999 bound parameters per statement
+            for start in range(0, len(hashes), 900):
+                chunk = hashes[start:start + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT content_hash FROM done WHERE input_key = ? AND content_hash IN ({placeholders})",
+                    [self.input_key, *chunk]
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def filter(self, batch: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str]]:
+        """
+        Drop (trend, content) pairs finished by an earlier run
+        """
+        hashes = [content_hash(content) for _, content in batch]
+        done = self.done_hashes(sorted(set(hashes)))
+        kept = [item for item, item_hash in zip(batch, hashes) if item_hash not in done]
+        with self.lock:
+            self.resumed += len(batch) - len(kept)
+        return kept
+
+    def mark_done(self, hashes: Iterable[str]):
+        """
+        Record written rows; committed immediately so progress survives a crash
+        """
+        hashes = [(self.input_key, item_hash) for item_hash in hashes]
+        if not hashes:
+            return
+        with self.lock:
+            self.connection.executemany("INSERT OR IGNORE INTO done VALUES (?, ?)", hashes)
+            self.connection.execute(
+                "UPDATE runs SET updated_at = ? WHERE input_key = ?",
+                (datetime.now(timezone.utc).isoformat(), self.input_key)
+            )
+            self.connection.commit()
+            self.recorded += len(hashes)
+
+    def finish(self):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE runs SET finished_at = ? WHERE input_key = ?",
+                (datetime.now(timezone.utc).isoformat(), self.input_key)
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
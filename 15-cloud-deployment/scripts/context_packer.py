@@ -0,0 +1,134 @@
+"""
+Context Packer
+Fits retrieved fashion trends into a token budget before they go into the prompt
+"""
+
+import re
+from typing import List, Dict, Set
+
+# Rough rule of thumb for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a piece of text will use
+    """
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text down to roughly `max_tokens`, ending on a word boundary
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + "..."
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Break text into overlapping word groups for near-duplicate checks
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """
+    Share of word groups two texts have in common (0 = none, 1 = identical)
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def format_trend(trend: Dict, details: str) -> str:
+    """
+    Render one trend the way the prompt expects it
+    """
+    return (
+        f"Trend: {trend.get('title', 'N/A')}\n"
+        f"Category: {trend.get('category', 'N/A')}\n"
+        f"Season: {trend.get('season', 'N/A')}\n"
+        f"Details: {details}"
+    )
+
+
+class ContextPacker:
+    """
+    Packs retrieved trends into a prompt context under a token budget
+
+    Learning Notes:
+    - Near-duplicate trends add tokens without adding information
+    - Long documents are truncated to a per-trend budget
+    - Trends are added in relevance order until the total budget is spent
+    """
+
+    def __init__(
+        self,
+        total_tokens: int = 1500,
+        item_tokens: int = 300,
+        duplicate_threshold: float = 0.85
+    ):
+        self.total_tokens = total_tokens
+        self.item_tokens = item_tokens
+        self.duplicate_threshold = duplicate_threshold
+
+    def pack(self, trends: List[Dict]) -> Dict:
+        """
+        Build the context string and report how many tokens were saved
+        """
+        # Retrieval already returns trends by relevance; re-sort only when
+        # similarity scores are available
+        if all("similarity" in trend for trend in trends):
+            trends = sorted(trends, key=lambda t: t["similarity"], reverse=True)
+
+        unpacked = "\n\n".join(
+            format_trend(trend, trend.get("content", "N/A")) for trend in trends
+        )
+        tokens_before = estimate_tokens(unpacked)
+
+        kept_trends = []
+        blocks = []
+        seen = []
+        duplicates = 0
+        tokens_used = 0
+
+        for trend in trends:
+            content = trend.get("content") or "N/A"
+            trend_shingles = shingles(content)
+            if any(jaccard(trend_shingles, other) >= self.duplicate_threshold for other in seen):
+                duplicates += 1
+                continue
+
+            block = format_trend(trend, truncate_to_tokens(content, self.item_tokens))
+            block_tokens = estimate_tokens(block)
+            if tokens_used + block_tokens > self.total_tokens:
+                break
+
+            seen.append(trend_shingles)
+            kept_trends.append(trend)
+            blocks.append(block)
+            tokens_used += block_tokens
+
+        context = "\n\n".join(blocks)
+        tokens_after = estimate_tokens(context)
+
+        return {
+            "context": context,
+            "trends": kept_trends,
+            "stats": {
+                "tokens_before": tokens_before,
+                "tokens_after": tokens_after,
+                "tokens_saved": max(0, tokens_before - tokens_after),
+                "duplicates_dropped": duplicates,
+                "trends_dropped": len(trends) - len(kept_trends) - duplicates
+            }
+        }
@@ -1,29 +1,98 @@
 """
 Step 9: The AI Stylist - Create Vector Embeddings
 This script creates embeddings from scraped fashion trends and stores them in Supabase
+
+It is also a library: importing it has no side effects, and clients are
+created on first use, so Celery workers or the API can ingest in-process:
+
+    from create_embeddings import embed_and_store
+    report = embed_and_store(trends, batch_size=100, concurrency=4)
 """
 
-import json
+import argparse
 import os
 import sys
-from typing import List, Dict
+import threading
+import uuid
+from typing import List, Dict, Iterable, Iterator, Optional
 import requests
 from supabase import create_client, Client
 
+from context_packer import estimate_tokens
+from checkpoint import DEFAULT_CHECKPOINT_PATH, EmbeddingCheckpoint
+from dedup import StreamingDeduplicator, deduplicate_trends
+from embedding_writer import BulkUpsertWriter, CopyUpsertWriter, ExistingContentFilter, content_hash
+from ingestion_pipeline import IngestionPipeline
+from pg_store import PostgresVectorStore, get_vector_store
+from rate_limiter import OPENAI_MAX_CONCURRENCY, RateLimitScheduler, get_scheduler
+from trend_stream import iter_trends
+
 # Configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL", "YOUR_SUPABASE_URL")
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL", "YOUR_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "YOUR_SERVICE_ROLE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "YOUR_OPENAI_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+EMBEDDING_MODEL = "text-embedding-ada-002"
 
-def validate_environment():
-    """Validate that all required environment variables are set"""
+# Request limits for batched embeddings: the API accepts up to 2048 inputs
+# and 8191 tokens per input; total tokens per request are capped too
+EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "2048"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "250000"))
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+# Bulk writes: rows per upsert request and the column(s) that identify a row
+UPSERT_CHUNK_SIZE = int(os.getenv("UPSERT_CHUNK_SIZE", "200"))
+UPSERT_CONFLICT_KEY = os.getenv("UPSERT_CONFLICT_KEY", "content_hash")
+
+# Ingestion pipeline: embedding requests in flight, trends per batch and
+# batches each queue may hold
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
+# Scraped trends: a JSON array or JSON Lines file, optionally gzip-compressed
+SCRAPED_TRENDS_FILE = os.getenv("SCRAPED_TRENDS_FILE", "scraped_trends.json")
+# Local progress file used by --resume
+CHECKPOINT_PATH = os.getenv("EMBEDDING_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+
+# Near-duplicate trends (same story from several outlets) are embedded once
+# DEDUP_MODE: "skip" drops later copies while streaming, "merge" folds copies
+# into one row (loads the whole file into memory first), "off" disables
+DEDUP_MODE = os.getenv("DEDUP_MODE", "skip")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Column type of fashion_embeddings.embedding: "vector" (float32) or
+# "halfvec" (float16, after 008_convert_embeddings_to_halfvec.sql)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+EMBEDDING_STORAGE_TYPES = ("vector", "halfvec")
+
+# How rows are written: "supabase" (PostgREST upserts) or "postgres" (binary
+# COPY over DATABASE_URL, see pg_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "supabase")
+VECTOR_BACKENDS = ("supabase", "postgres")
+# Rows per COPY when VECTOR_BACKEND=postgres
+COPY_CHUNK_SIZE = int(os.getenv("COPY_CHUNK_SIZE", "2000"))
+
+
+class ConfigurationError(Exception):
+    """Raised when a client is needed but its environment variables are missing or invalid"""
+
+
+def missing_environment() -> List[str]:
+    """
+    Names of required environment variables that are unset or placeholders
+    """
     required_vars = {
-        "SUPABASE_URL": os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL"),
-        "SUPABASE_SERVICE_ROLE_KEY": os.getenv("SUPABASE_SERVICE_ROLE_KEY"),
-        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY")
+        "SUPABASE_URL": SUPABASE_URL,
+        "SUPABASE_SERVICE_ROLE_KEY": SUPABASE_KEY,
+        "OPENAI_API_KEY": OPENAI_API_KEY
     }
-    
-    missing = [key for key, value in required_vars.items() if not value or value.startswith("YOUR_")]
+    return [key for key, value in required_vars.items() if not value or value.startswith("YOUR_")]
+
+
+def validate_environment():
+    """Validate that all required environment variables are set (command line only)"""
+    missing = missing_environment()
     
     if missing:
         print("❌ ERROR: Missing required environment variables!")
@@ -58,26 +127,91 @@ def validate_environment():
         print("   OpenAI: https://platform.openai.com/api-keys")
         
         sys.exit(1)
+
+
+# Created on first use, so importing this module has no side effects
+_supabase: Optional[Client] = None
+_embedding_client: Optional["EmbeddingClient"] = None
+_clients_lock = threading.Lock()
+
+
+def get_supabase() -> Client:
+    """
+    The shared Supabase client, created on first use
+    """
+    global _supabase
+    with _clients_lock:
+        if _supabase is None:
+            if {"SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY"} & set(missing_environment()):
+                raise ConfigurationError("Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY to store embeddings")
+            _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return _supabase
+
+
+class EmbeddingClient:
+    """
+    OpenAI embeddings endpoint settings plus a pooled HTTP session
+    
+    Learning Note:
+    - The session keeps connections open between batches, so a long-lived
+      worker skips the TCP/TLS handshake on every request
+    - Requests go through the shared rate limiter for the embeddings endpoint
+    """
     
-    return required_vars
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENAI_BASE_URL,
+        model: str = EMBEDDING_MODEL,
+        scheduler: Optional[RateLimitScheduler] = None,
+        session: Optional[requests.Session] = None
+    ):
+        self.api_key = api_key or OPENAI_API_KEY
+        self.base_url = base_url
+        self.model = model
+        self.scheduler = scheduler or get_scheduler("embeddings")
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=OPENAI_MAX_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+    
+    def post(self, inputs, tokens: int) -> Dict:
+        """
+        One embeddings request; `inputs` is a string or a list of strings
+        """
+        url = f"{self.base_url}/embeddings"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "input": inputs,
+            "model": self.model  # OpenAI's embedding model
+        }
+        
+        # Waits for RPM/TPM budget and retries 429s (shared with other callers)
+        response = self.scheduler.post(
+            url, tokens=tokens, session=self.session, headers=headers, json=payload
+        )
+        return response.json()
 
-# Validate and get environment variables
-env_vars = validate_environment()
-SUPABASE_URL = env_vars["SUPABASE_URL"]
-SUPABASE_KEY = env_vars["SUPABASE_SERVICE_ROLE_KEY"]
-OPENAI_API_KEY = env_vars["OPENAI_API_KEY"]
 
-# Initialize Supabase client
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print("✓ Connected to Supabase successfully")
-except Exception as e:
-    print(f"❌ Failed to connect to Supabase: {e}")
-    print("\n💡 Check that your SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are correct")
-    sys.exit(1)
+def get_embedding_client() -> EmbeddingClient:
+    """
+    The shared embedding client, created on first use
+    """
+    global _embedding_client
+    with _clients_lock:
+        if _embedding_client is None:
+            if "OPENAI_API_KEY" in missing_environment():
+                raise ConfigurationError("Set OPENAI_API_KEY to create embeddings")
+            _embedding_client = EmbeddingClient()
+        return _embedding_client
 
 
-def create_embedding(text: str) -> List[float]:
+def create_embedding(text: str, client: Optional[EmbeddingClient] = None) -> List[float]:
     """
     Create an embedding vector for the given text using OpenAI's API
     
@@ -86,21 +220,10 @@ def create_embedding(text: str) -> List[float]:
     - Similar texts have similar vectors (measured by cosine similarity)
     - This allows us to find semantically related content
     """
-    url = "https://api.openai.com/v1/embeddings"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "input": text,
-        "model": "text-embedding-ada-002"  # OpenAI's embedding model
-    }
+    client = client or get_embedding_client()
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
+        data = client.post(text, tokens=estimate_tokens(text))
         return data["data"][0]["embedding"]
     except Exception as e:
         print(f"❌ Error creating embedding: {e}")
@@ -109,35 +232,135 @@ def create_embedding(text: str) -> List[float]:
         raise
 
 
-def load_scraped_trends(file_path: str = "scraped_trends.json") -> List[Dict]:
+def plan_batches(
+    texts: List[str],
+    max_inputs: int = EMBEDDING_BATCH_MAX_INPUTS,
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS
+) -> List[List[int]]:
+    """
+    Group text positions into batches that stay under the request limits
+    
+    Learning Note:
+    - Token counts are estimated (about 4 characters per token)
+    - A batch is closed when adding the next text would pass either limit
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    
+    for position, text in enumerate(texts):
+        tokens = min(estimate_tokens(text), EMBEDDING_MAX_INPUT_TOKENS)
+        if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+
+def request_embeddings(texts: List[str], client: Optional[EmbeddingClient] = None) -> List[List[float]]:
     """
-    Load scraped fashion trends from JSON file
+    One embeddings request for a list of texts, returned in input order
+    """
+    client = client or get_embedding_client()
+    data = client.post(
+        texts,
+        tokens=sum(min(estimate_tokens(text), EMBEDDING_MAX_INPUT_TOKENS) for text in texts)
+    )
+    ordered = sorted(data["data"], key=lambda item: item["index"])
+    if len(ordered) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(ordered)}")
+    return [item["embedding"] for item in ordered]
+
+
+def embed_with_split(texts: List[str], client: Optional[EmbeddingClient] = None) -> List[Optional[List[float]]]:
+    """
+    Embed a batch; if the request fails, split it in half and retry each half
+    
+    Learning Note:
+    - One bad input (e.g. too long) fails the whole request
+    - Halving isolates it in log2(batch size) extra requests, and every
+      other text still gets its embedding
+    - A text that fails on its own gets None
     """
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
+        return request_embeddings(texts, client)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 401:
+            print("💡 Check that your OPENAI_API_KEY is valid")
+            raise
+        if e.response is not None and e.response.status_code == 429:
+            # Still throttled after the scheduler's retries; smaller
+            # batches wouldn't help
+            raise
+        error = e
+    except Exception as e:
+        error = e
+    
+    if len(texts) == 1:
+        print(f"✗ Could not embed text ({len(texts[0])} chars): {error}")
+        return [None]
+    
+    middle = len(texts) // 2
+    print(f"   Batch of {len(texts)} failed ({error}); retrying as {middle} + {len(texts) - middle}")
+    return embed_with_split(texts[:middle], client) + embed_with_split(texts[middle:], client)
+
+
+def create_embeddings_batch(texts: List[str], client: Optional[EmbeddingClient] = None) -> List[Optional[List[float]]]:
+    """
+    Create embeddings for many texts with as few API requests as possible
+    Results line up with `texts`; failed texts get None
+    """
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    batches = plan_batches(texts)
+    
+    for number, batch in enumerate(batches, 1):
+        if len(batches) > 1:
+            print(f"   Embedding batch {number}/{len(batches)} ({len(batch)} texts)...")
+        results = embed_with_split([texts[position] for position in batch], client)
+        for position, embedding in zip(batch, results):
+            embeddings[position] = embedding
+    
+    return embeddings
+
+
+SAMPLE_TRENDS = [
+    {
+        "title": "Minimalist Fashion Revival",
+        "category": "Style Guide",
+        "season": "Spring 2024",
+        "description": "Clean lines and neutral tones dominate the runway"
+    },
+    {
+        "title": "Bold Color Blocking",
+        "category": "Trends",
+        "season": "Summer 2024",
+        "description": "Vibrant contrasting colors create striking outfits"
+    },
+    {
+        "title": "Sustainable Fashion",
+        "category": "Eco-Friendly",
+        "season": "All Seasons",
+        "description": "Recycled materials and ethical production methods"
+    }
+]
+
+
+def load_scraped_trends(file_path: str = SCRAPED_TRENDS_FILE) -> Iterator[Dict]:
+    """
+    Stream scraped fashion trends from a JSON, JSON Lines or .gz file
+    
+    Learning Note:
+    - Trends are yielded one at a time, so memory doesn't grow with the
+      file size and embedding starts before the file is fully read
+    """
+    if not os.path.exists(file_path):
         print(f"File {file_path} not found. Using sample data.")
-        return [
-            {
-                "title": "Minimalist Fashion Revival",
-                "category": "Style Guide",
-                "season": "Spring 2024",
-                "description": "Clean lines and neutral tones dominate the runway"
-            },
-            {
-                "title": "Bold Color Blocking",
-                "category": "Trends",
-                "season": "Summer 2024",
-                "description": "Vibrant contrasting colors create striking outfits"
-            },
-            {
-                "title": "Sustainable Fashion",
-                "category": "Eco-Friendly",
-                "season": "All Seasons",
-                "description": "Recycled materials and ethical production methods"
-            }
-        ]
+        return iter(SAMPLE_TRENDS)
+    return iter_trends(file_path)
 
 
 def create_content_string(trend: Dict) -> str:
@@ -158,20 +381,52 @@ def create_content_string(trend: Dict) -> str:
     return "\n".join(parts)
 
 
+def trend_row_id(content: str) -> str:
+    """
+    Stable id derived from the content, so re-running the script upserts
+    the same rows instead of inserting duplicates
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"fashion_embeddings:{content}"))
+
+
+def storage_embedding(embedding: List[float]):
+    """
+    The embedding in the form the configured column type stores
+    
+    halfvec keeps about 3 significant digits, so its rows are sent as a
+    pgvector text literal with 4, roughly halving the upsert payload
+    """
+    if EMBEDDING_STORAGE == "halfvec":
+        return "[" + ",".join(f"{value:.4g}" for value in embedding) + "]"
+    return embedding
+
+
+def build_row(trend: Dict, embedding: List[float]) -> Dict:
+    """
+    The fashion_embeddings row for one trend
+    """
+    content = create_content_string(trend)
+    return {
+        "id": trend_row_id(content),
+        "content": content,
+        "content_hash": content_hash(content),
+        # Denormalised for search results and category/season filters
+        "title": trend.get("title") or None,
+        "category": trend.get("category") or None,
+        "season": trend.get("season") or None,
+        "metadata": trend,
+        "embedding": storage_embedding(embedding)
+    }
+
+
 def store_embedding(trend: Dict, embedding: List[float]) -> bool:
     """
     Store the trend and its embedding in Supabase
     """
     try:
-        content = create_content_string(trend)
+        data = build_row(trend, embedding)
         
-        data = {
-            "content": content,
-            "metadata": trend,
-            "embedding": embedding
-        }
-        
-        result = supabase.table("fashion_embeddings").insert(data).execute()
+        result = get_supabase().table("fashion_embeddings").upsert(data, on_conflict=UPSERT_CONFLICT_KEY).execute()
         print(f"✓ Stored embedding for: {trend.get('title')}")
         return True
         
@@ -182,38 +437,173 @@ def store_embedding(trend: Dict, embedding: List[float]) -> bool:
         return False
 
 
-def main():
+def embed_and_store(
+    trends: Iterable[Dict],
+    *,
+    batch_size: int = INGEST_BATCH_SIZE,
+    concurrency: int = INGEST_WORKERS,
+    supabase_client: Optional[Client] = None,
+    embedding_client: Optional[EmbeddingClient] = None,
+    dedup_mode: str = DEDUP_MODE,
+    checkpoint: Optional[EmbeddingCheckpoint] = None,
+    vector_store: Optional[PostgresVectorStore] = None
+) -> Dict:
+    """
+    Embed trends and upsert them into fashion_embeddings
+    
+    Args:
+        trends: Any iterable of trend dicts (a list, or a stream from iter_trends)
+        batch_size: Trends per embedding request
+        concurrency: Embedding requests in flight at once
+        supabase_client / embedding_client: Injected clients; the shared,
+            lazily created ones are used when omitted
+        dedup_mode: "skip", "merge" or "off" (see DEDUP_MODE)
+        checkpoint: Records written trends and skips ones finished earlier
+        vector_store: Write rows with COPY through this store (the shared
+            one is used when VECTOR_BACKEND=postgres)
+    
+    Returns:
+        Per-stage pipeline report plus dedup and rate limit counters
+    """
+    if EMBEDDING_STORAGE not in EMBEDDING_STORAGE_TYPES:
+        raise ConfigurationError(
+            f"EMBEDDING_STORAGE must be one of {EMBEDDING_STORAGE_TYPES}, got '{EMBEDDING_STORAGE}'"
+        )
+    if VECTOR_BACKEND not in VECTOR_BACKENDS:
+        raise ConfigurationError(f"VECTOR_BACKEND must be one of {VECTOR_BACKENDS}, got '{VECTOR_BACKEND}'")
+    supabase_client = supabase_client or get_supabase()
+    embedding_client = embedding_client or get_embedding_client()
+    
+    # Skip near-duplicates so each story is embedded once
+    deduplicator = None
+    dedup_report = None
+    if dedup_mode == "merge":
+        print("\n   Removing near-duplicate trends (merge mode reads every trend first)...")
+        trends, dedup_report = deduplicate_trends(
+            list(trends),
+            create_content_string,
+            threshold=DEDUP_THRESHOLD,
+            mode=dedup_mode
+        )
+        print(f"   {dedup_report['duplicates']} duplicates in {dedup_report['duplicate_clusters']} clusters "
+              f"(dedup ratio {dedup_report['dedup_ratio']:.1%}), {dedup_report['unique']} unique trends left")
+    elif dedup_mode != "off":
+        deduplicator = StreamingDeduplicator(create_content_string, threshold=DEDUP_THRESHOLD)
+        trends = deduplicator.filter(trends)
+    
+    # Embed and store concurrently: a loader feeds embedding workers, and a
+    # batching writer upserts their results into Supabase
+    on_written = (lambda rows: checkpoint.mark_done(row["content_hash"] for row in rows)) if checkpoint else None
+    if vector_store is None and VECTOR_BACKEND == "postgres":
+        vector_store = get_vector_store()
+    if vector_store is not None:
+        writer = CopyUpsertWriter(
+            vector_store,
+            chunk_size=COPY_CHUNK_SIZE,
+            on_conflict=UPSERT_CONFLICT_KEY,
+            on_written=on_written
+        )
+    else:
+        writer = BulkUpsertWriter(
+            supabase_client,
+            chunk_size=UPSERT_CHUNK_SIZE,
+            on_conflict=UPSERT_CONFLICT_KEY,
+            on_written=on_written
+        )
+    existing_filter = ExistingContentFilter(supabase_client)
+    
+    def skip_finished(batch):
+        # Local checkpoint first, then one bulk hash lookup for the rest
+        if checkpoint is not None:
+            batch = checkpoint.filter(batch)
+        return existing_filter(batch) if batch else batch
+    
+    pipeline = IngestionPipeline(
+        content_fn=create_content_string,
+        embed_fn=lambda texts: create_embeddings_batch(texts, embedding_client),
+        row_fn=build_row,
+        writer=writer,
+        workers=concurrency,
+        batch_size=batch_size,
+        queue_size=INGEST_QUEUE_SIZE,
+        filter_fn=skip_finished
+    )
+    report = pipeline.run(trends)
+    
+    if deduplicator is not None:
+        dedup_report = deduplicator.report()
+    report["dedup"] = dedup_report
+    report["skipped_from_checkpoint"] = checkpoint.resumed if checkpoint is not None else 0
+    report["rate_limits"] = embedding_client.scheduler.status()
+    return report
+
+
+def main(
+    input_file: str = SCRAPED_TRENDS_FILE,
+    resume: bool = False,
+    checkpoint_path: str = CHECKPOINT_PATH
+):
     """
     Main function to create and store embeddings
+    
+    With resume=True, trends recorded in the checkpoint file by an earlier
+    (interrupted) run for the same input file are skipped.
     """
+    validate_environment()
+    
     print("=" * 60)
     print("Step 9: Creating Fashion Trend Embeddings")
     print("=" * 60)
     
-    # Load scraped trends
+    try:
+        get_supabase()
+        print("✓ Connected to Supabase successfully")
+    except Exception as e:
+        print(f"❌ Failed to connect to Supabase: {e}")
+        print("\n💡 Check that your SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are correct")
+        sys.exit(1)
+    
+    # Progress is recorded per input file so an interrupted run can resume
+    checkpoint = EmbeddingCheckpoint(checkpoint_path, input_file)
+    already_done = checkpoint.start(resume=resume)
+    if resume:
+        print(f"\n   Resuming: {already_done} trends already done for {input_file}")
+    
+    # Stream scraped trends
     print("\n1. Loading scraped trends...")
-    trends = load_scraped_trends()
-    print(f"   Loaded {len(trends)} trends")
+    trends = load_scraped_trends(input_file)
     
-    # Create and store embeddings
-    print("\n2. Creating embeddings and storing in Supabase...")
-    success_count = 0
+    print(f"\n2. Embedding and storing with {INGEST_WORKERS} workers...")
+    report = embed_and_store(trends, checkpoint=checkpoint)
+    if not report["stopped_early"]:
+        checkpoint.finish()
+    checkpoint.close()
     
-    for i, trend in enumerate(trends, 1):
-        print(f"\n   Processing trend {i}/{len(trends)}...")
-        
-        # Create content string
-        content = create_content_string(trend)
-        
-        # Generate embedding
-        embedding = create_embedding(content)
-        
-        # Store in Supabase
-        if store_embedding(trend, embedding):
-            success_count += 1
+    dedup_report = report["dedup"]
+    if dedup_report is not None and dedup_report["mode"] == "skip":
+        print(f"   Dropped {dedup_report['duplicates']} near-duplicates of {dedup_report['input']} trends "
+              f"(dedup ratio {dedup_report['dedup_ratio']:.1%})")
+    for stage in ("load", "embed", "write"):
+        stats = report[stage]
+        print(f"   {stage:>5}: {stats['items']} items in {stats['batches']} batches, "
+              f"{stats['errors']} errors, {stats['items_per_second']} items/sec busy")
+    print(f"   Skipped {report['skipped_unchanged']} trends that are already stored "
+          f"({report['skipped_from_checkpoint']} from the checkpoint)")
+    writer_stats = report["writer"]
+    success_count = writer_stats["rows_written"]
+    print(f"   Wrote {success_count} rows in {writer_stats['chunks']} chunks "
+          f"({writer_stats['rows_per_second']} rows/sec, "
+          f"{writer_stats['fallback_chunks']} chunks retried row by row) in {report['elapsed_seconds']}s")
+    limiter = report["rate_limits"]
+    print(f"   Rate limits: {limiter['sent']} embedding requests, {limiter['throttled']} throttled (429), "
+          f"{limiter['retries']} retries, {limiter['wait_seconds']}s queued for budget")
+    if report["error"]:
+        print(f"   ✗ Writer failed: {report['error']}")
+    if report["stopped_early"]:
+        print("   ⚠ Stopped early; re-run with --resume to finish the remaining trends")
     
     print("\n" + "=" * 60)
-    print(f"✓ Successfully stored {success_count}/{len(trends)} embeddings")
+    print(f"✓ Successfully stored {success_count}/{report['load']['items'] - report['skipped_unchanged']} new embeddings")
     print("=" * 60)
     print("\nNext Steps:")
     print("1. Run the RAG pipeline to get recommendations")
@@ -221,4 +611,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create and store fashion trend embeddings")
+    parser.add_argument("input_file", nargs="?", default=SCRAPED_TRENDS_FILE,
+                        help="JSON, JSON Lines or .gz file of scraped trends")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip trends finished by an earlier run of the same file")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Checkpoint (SQLite) file")
+    args = parser.parse_args()
+    
+    main(args.input_file, resume=args.resume, checkpoint_path=args.checkpoint)
@@ -0,0 +1,254 @@
+"""
+Near-Duplicate Detection
+Finds scraped trends that tell the same story (e.g. one article syndicated
+by several outlets) before they are embedded, using MinHash signatures
+bucketed with locality-sensitive hashing (LSH)
+"""
+
+import hashlib
+from typing import List, Dict, Callable, Iterable, Iterator, Tuple, Optional
+
+import numpy as np
+
+from context_packer import shingles, jaccard
+
+# Mersenne prime used for the MinHash permutations
+MERSENNE_PRIME = (1 << 31) - 1
+NUM_PERMUTATIONS = 128
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """
+    Stable 31-bit hash of every word shingle in the text
+    """
+    values = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        % MERSENNE_PRIME
+        for shingle in shingles(text)
+    ]
+    return np.array(values or [0], dtype=np.uint64)
+
+
+def choose_bands(num_permutations: int, threshold: float) -> Tuple[int, int]:
+    """
+    Split the signature into bands x rows so pairs near `threshold`
+    similarity usually share at least one bucket
+
+    Learning Note:
+    - Two texts collide in a band with probability J^rows, so the LSH
+      "threshold" is roughly (1 / bands) ^ (1 / rows)
+    - We take the highest such threshold that is still below the target;
+      candidates are then checked with an exact Jaccard comparison
+    """
+    best = (num_permutations, 1)
+    best_threshold = 0.0
+    for rows in range(1, num_permutations + 1):
+        if num_permutations % rows:
+            continue
+        bands = num_permutations // rows
+        lsh_threshold = (1 / bands) ** (1 / rows)
+        if best_threshold < lsh_threshold < threshold:
+            best, best_threshold = (bands, rows), lsh_threshold
+    return best
+
+
+class MinHasher:
+    """
+    MinHash signatures: the share of positions where two signatures agree
+    estimates the Jaccard similarity of the two shingle sets
+    """
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_permutations, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        # (permutations x shingles); every product fits in 62 bits
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+class UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # The earlier row stays the canonical one
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def merge_duplicates(canonical: Dict, duplicates: List[Dict]) -> Dict:
+    """
+    Keep the canonical trend, fill its empty fields from the copies and
+    remember where the copies came from
+    """
+    merged = dict(canonical)
+    for duplicate in duplicates:
+        for key, value in duplicate.items():
+            if value and not merged.get(key):
+                merged[key] = value
+    merged["duplicates"] = [
+        {key: duplicate[key] for key in ("title", "url", "source") if duplicate.get(key)}
+        for duplicate in duplicates
+    ]
+    return merged
+
+
+def deduplicate_trends(
+    trends: List[Dict],
+    text_fn: Callable[[Dict], str],
+    threshold: float = 0.8,
+    mode: str = "merge",
+    num_permutations: int = NUM_PERMUTATIONS,
+    bands: Optional[int] = None
+) -> Tuple[List[Dict], Dict]:
+    """
+    Drop near-duplicate trends before embedding
+
+    Args:
+        trends: Scraped trends, in input order
+        text_fn: Builds the text to compare (create_content_string)
+        threshold: Word-shingle Jaccard similarity that counts as a duplicate
+        mode: "merge" folds copies into the canonical trend, "skip" drops them
+
+    Returns:
+        (unique trends, report with counts and the dedup ratio)
+    """
+    if mode not in ("merge", "skip"):
+        raise ValueError(f"Unknown dedup mode '{mode}'")
+
+    if bands is None:
+        bands, rows = choose_bands(num_permutations, threshold)
+    else:
+        rows = num_permutations // bands
+
+    texts = [text_fn(trend) for trend in trends]
+    shingle_sets = [shingles(text) for text in texts]
+    hasher = MinHasher(num_permutations)
+    signatures = [hasher.signature(text) for text in texts]
+
+    # Rows that share any band bucket become candidate pairs
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    for index, signature in enumerate(signatures):
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(index)
+
+    groups = UnionFind(len(trends))
+    checked = set()
+    candidate_pairs = 0
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                if (first, second) in checked:
+                    continue
+                checked.add((first, second))
+                candidate_pairs += 1
+                if jaccard(shingle_sets[first], shingle_sets[second]) >= threshold:
+                    groups.union(first, second)
+
+    clusters: Dict[int, List[int]] = {}
+    for index in range(len(trends)):
+        clusters.setdefault(groups.find(index), []).append(index)
+
+    unique = []
+    for root in sorted(clusters):
+        members = clusters[root]
+        canonical = trends[members[0]]
+        if mode == "merge" and len(members) > 1:
+            canonical = merge_duplicates(canonical, [trends[i] for i in members[1:]])
+        unique.append(canonical)
+
+    duplicates = len(trends) - len(unique)
+    report = {
+        "input": len(trends),
+        "unique": len(unique),
+        "duplicates": duplicates,
+        "dedup_ratio": round(duplicates / len(trends), 4) if trends else 0.0,
+        "duplicate_clusters": sum(1 for members in clusters.values() if len(members) > 1),
+        "candidate_pairs": candidate_pairs,
+        "threshold": threshold,
+        "bands": bands,
+        "rows_per_band": rows,
+        "mode": mode
+    }
+    return unique, report
+
+
+class StreamingDeduplicator:
+    """
+    Near-duplicate filter for trends that arrive one at a time
+
+    Learning Notes:
+    - The first copy of a story is passed through; later copies are dropped
+      (they can't be merged into a trend that was already embedded)
+    - Only LSH buckets and compact signatures are kept, not the trends
+      themselves, so memory grows by a couple of KB per unique trend
+    - Candidates are confirmed by signature agreement (estimated Jaccard)
+    """
+
+    def __init__(
+        self,
+        text_fn: Callable[[Dict], str],
+        threshold: float = 0.8,
+        num_permutations: int = NUM_PERMUTATIONS
+    ):
+        self.text_fn = text_fn
+        self.threshold = threshold
+        self.hasher = MinHasher(num_permutations)
+        self.bands, self.rows = choose_bands(num_permutations, threshold)
+        self.buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self.signatures: List[np.ndarray] = []
+        self.seen = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, trend: Dict) -> bool:
+        """
+        Check a trend and remember it if it is new
+        """
+        self.seen += 1
+        # Values are below 2**31, so uint32 halves the memory per signature
+        signature = self.hasher.signature(self.text_fn(trend)).astype(np.uint32)
+        keys = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+        candidates = {index for key in keys for index in self.buckets.get(key, ())}
+        for index in candidates:
+            if np.mean(self.signatures[index] == signature) >= self.threshold:
+                self.duplicates += 1
+                return True
+
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(index)
+        return False
+
+    def filter(self, trends: Iterable[Dict]) -> Iterator[Dict]:
+        for trend in trends:
+            if not self.is_duplicate(trend):
+                yield trend
+
+    def report(self) -> Dict:
+        return {
+            "input": self.seen,
+            "unique": self.seen - self.duplicates,
+            "duplicates": self.duplicates,
+            "dedup_ratio": round(self.duplicates / self.seen, 4) if self.seen else 0.0,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows_per_band": self.rows,
+            "mode": "skip"
+        }
@@ -0,0 +1,198 @@
+"""
+Bulk Embedding Writer
+Buffers fashion_embeddings rows and upserts them in chunks, so a run costs
+one PostgREST round trip (or one COPY) per chunk instead of one per trend,
+and skips trends whose content is already stored
+"""
+
+import hashlib
+import threading
+import time
+from typing import Callable, List, Dict, Optional, Set, Tuple
+
+from postgrest.types import ReturnMethod
+
+# Hashes per lookup request; 64-character hashes keep the URL under ~8 KB
+HASH_LOOKUP_CHUNK = 100
+
+
+def content_hash(content: str) -> str:
+    """
+    SHA-256 of the embedded content (matches 004_add_content_hash.sql)
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def fetch_existing_hashes(client, hashes: List[str], table: str = "fashion_embeddings") -> Set[str]:
+    """
+    Which of `hashes` are already stored, looked up in bulk
+    """
+    existing = set()
+    for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+        chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+        response = client.table(table).select("content_hash").in_("content_hash", chunk).execute()
+        existing.update(row["content_hash"] for row in response.data or [])
+    return existing
+
+
+class ExistingContentFilter:
+    """
+    Drops trends whose content is already stored (or already queued in
+    this run), so an unchanged dataset costs zero embedding calls
+
+    Learning Note:
+    - Works on one batch at a time, so it also fits a streaming loader
+    - Only hashes are kept in memory, not trends
+    """
+
+    def __init__(self, client, table: str = "fashion_embeddings"):
+        self.client = client
+        self.table = table
+        self.seen: Set[str] = set()
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, batch: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str]]:
+        """
+        Keep the (trend, content) pairs that still need embedding
+        """
+        hashes = [content_hash(content) for _, content in batch]
+        existing = fetch_existing_hashes(self.client, sorted(set(hashes)), self.table)
+
+        fresh = []
+        with self.lock:
+            for item, item_hash in zip(batch, hashes):
+                if item_hash in existing or item_hash in self.seen:
+                    continue
+                self.seen.add(item_hash)
+                fresh.append(item)
+            self.skipped += len(batch) - len(fresh)
+        return fresh
+
+
+class BulkUpsertWriter:
+    """
+    Chunked upserts with a per-row fallback
+
+    Learning Notes:
+    - Rows are sent `chunk_size` at a time as one INSERT ... ON CONFLICT
+    - `on_conflict` names the unique column(s), so re-running the same data
+      updates rows instead of adding duplicates
+    - returning=minimal stops PostgREST from echoing every embedding back
+    - If a chunk fails, only that chunk is retried row by row, so one bad
+      row doesn't lose the other rows in its chunk
+
+    Usage:
+        with BulkUpsertWriter(supabase, chunk_size=200) as writer:
+            for row in rows:
+                writer.add(row)
+        print(writer.stats())
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str = "fashion_embeddings",
+        chunk_size: int = 200,
+        on_conflict: str = "id",
+        on_written: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        self.client = client
+        self.table = table
+        self.chunk_size = chunk_size
+        self.on_conflict = on_conflict
+        # Called with the rows of every successful write (e.g. checkpointing)
+        self.on_written = on_written
+        self.buffer: List[Dict] = []
+
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.chunks = 0
+        self.fallback_chunks = 0
+        self.write_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add(self, row: Dict):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def add_many(self, rows: List[Dict]):
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        """
+        Write everything still buffered
+        """
+        while self.buffer:
+            chunk = self.buffer[:self.chunk_size]
+            self.buffer = self.buffer[self.chunk_size:]
+            self.write_chunk(chunk)
+
+    def upsert(self, rows: List[Dict]):
+        (
+            self.client.table(self.table)
+            .upsert(rows, on_conflict=self.on_conflict, returning=ReturnMethod.minimal)
+            .execute()
+        )
+
+    def write_chunk(self, rows: List[Dict]):
+        start = time.perf_counter()
+        self.chunks += 1
+        written = []
+        try:
+            self.upsert(rows)
+            written = rows
+        except Exception as e:
+            self.fallback_chunks += 1
+            print(f"[Writer] Chunk of {len(rows)} rows failed ({e}); retrying row by row")
+            for row in rows:
+                try:
+                    self.upsert([row])
+                    written.append(row)
+                except Exception as row_error:
+                    self.rows_failed += 1
+                    print(f"[Writer] ✗ Row failed: {row_error}")
+        finally:
+            self.rows_written += len(written)
+            self.write_seconds += time.perf_counter() - start
+        
+        if written and self.on_written is not None:
+            self.on_written(written)
+
+    def stats(self) -> Dict:
+        return {
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "chunks": self.chunks,
+            "fallback_chunks": self.fallback_chunks,
+            "write_seconds": round(self.write_seconds, 2),
+            "rows_per_second": round(self.rows_written / self.write_seconds, 1) if self.write_seconds else 0.0
+        }
+
+
+class CopyUpsertWriter(BulkUpsertWriter):
+    """
+    BulkUpsertWriter that loads each chunk with binary COPY over a direct
+    Postgres connection (pg_store.PostgresVectorStore) instead of PostgREST
+
+    Learning Notes:
+    - No JSON: embeddings travel as 4-byte floats, and COPY skips per-row
+      INSERT overhead, so chunks can be much larger
+    - Chunking, the row-by-row fallback and on_written work as in
+      BulkUpsertWriter
+
+    Usage:
+        with CopyUpsertWriter(get_vector_store(), chunk_size=2000, on_conflict="content_hash") as writer:
+            writer.add_many(rows)
+    """
+
+    def upsert(self, rows: List[Dict]):
+        self.client.copy_upsert(rows, table=self.table, on_conflict=self.on_conflict)
+
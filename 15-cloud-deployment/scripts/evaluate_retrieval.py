@@ -0,0 +1,282 @@
+"""
+Retrieval Evaluation
+Compares every retriever (the match_fashion_trends RPC, exact local search
+and the approximate IVF index) on recall@k, latency and memory
+
+Learning Notes:
+- A held-out query set is taken from the stored trends: those rows are
+  removed from the local indexes, so a query never finds itself
+- Ground truth is an exact float64 cosine search over the remaining rows
+- recall@k = share of the true top-k that a retriever also returned
+- The output table has a fixed row order so results can be diffed
+  between releases
+
+Usage:
+    python evaluate_retrieval.py --synthetic 20000
+    python evaluate_retrieval.py --synthetic 20000 --rpc --output recall.md
+    python evaluate_retrieval.py --lists 50,100 --probes 1,5,10,20 --format tsv
+    python evaluate_retrieval.py --reduced-dims 128,256 --rerank-factors 4,10
+    python evaluate_retrieval.py --supabase --rpc --projection trend_projection.npz
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import List, Dict, Callable
+
+import numpy as np
+
+from vector_index import LocalTrendIndex, IVFTrendIndex, Projection, load_trend_embeddings, normalize_rows
+
+
+def load_source(args):
+    """
+    Rows and embeddings to evaluate on, plus a Supabase client when the RPC
+    should be measured too
+    """
+    if args.supabase:
+        from supabase import create_client
+        client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+        rows, embeddings = load_trend_embeddings(client)
+        return rows, embeddings, client, None
+
+    from stub_services import StubConfig, SyntheticCorpus, start_stub_server, STUB_API_KEY
+    corpus = SyntheticCorpus(args.synthetic, args.dimensions)
+    rows = [corpus.row(i) for i in range(corpus.rows)]
+
+    client, server = None, None
+    if args.rpc:
+        from supabase import create_client
+        server = start_stub_server(StubConfig(corpus))
+        client = create_client(f"http://127.0.0.1:{server.server_address[1]}", STUB_API_KEY)
+    return rows, corpus.matrix, client, server
+
+
+def split_queries(rows: List[Dict], embeddings: np.ndarray, count: int, seed: int):
+    """
+    Hold `count` rows out of the corpus to use as queries
+    """
+    rng = np.random.default_rng(seed)
+    held_out = np.zeros(len(rows), dtype=bool)
+    held_out[rng.choice(len(rows), min(count, len(rows) // 2), replace=False)] = True
+
+    corpus_rows = [row for row, hold in zip(rows, held_out) if not hold]
+    query_ids = [row["id"] for row, hold in zip(rows, held_out) if hold]
+    return corpus_rows, embeddings[~held_out], query_ids, embeddings[held_out]
+
+
+def ground_truth(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    """
+    Exact top-k row numbers for every query, computed in float64
+    """
+    unit_corpus = normalize_rows(corpus.astype(np.float64))
+    truth = []
+    for query in normalize_rows(queries.astype(np.float64)):
+        similarities = unit_corpus @ query
+        top = np.argpartition(-similarities, k - 1)[:k]
+        truth.append(top[np.argsort(-similarities[top])].tolist())
+    return truth
+
+
+def measure(search: Callable, queries: np.ndarray, truth_ids: List[set], k: int) -> Dict:
+    """
+    Run every query one at a time (like interactive traffic) and score it
+    """
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth_ids):
+        start = time.perf_counter()
+        matches = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {match["id"] for match in matches[:k]})
+
+    values = np.array(latencies)
+    return {
+        "recall": round(hits / (k * len(truth_ids)), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3)
+    }
+
+
+def local_configs(args, corpus: np.ndarray) -> List[Dict]:
+    """
+    Every local index configuration in the grid, in a fixed order
+    """
+    configs = [
+        {"retriever": "exact", "params": f"dtype={dtype}", "build": LocalTrendIndex, "kwargs": {"dtype": dtype}}
+        for dtype in args.dtypes.split(",")
+    ]
+
+    # Two-stage: projections fitted on the corpus (never on the held-out
+    # queries), plus the stored projection when one is given
+    projections = []
+    for dimensions in [int(value) for value in args.reduced_dims.split(",") if value]:
+        for method in args.projection_methods.split(","):
+            if method == "pca":
+                projections.append(Projection.fit_pca(corpus, dimensions, seed=args.seed))
+            elif method == "truncate":
+                projections.append(Projection.truncate(dimensions))
+    if args.projection:
+        stored = Projection.load(args.projection)
+        stored.metadata["label"] = "stored"
+        projections.append(stored)
+    for projection in projections:
+        for factor in [int(value) for value in args.rerank_factors.split(",") if value]:
+            label = "stored " if projection.metadata.get("label") == "stored" else ""
+            configs.append({
+                "retriever": "two-stage",
+                "params": f"{label}{projection.describe()} rerank={factor}",
+                "build": LocalTrendIndex,
+                "kwargs": {"projection": projection, "rerank_factor": factor}
+            })
+
+    for lists in [int(value) for value in args.lists.split(",") if value]:
+        for probes in [int(value) for value in args.probes.split(",") if value]:
+            for dtype in args.ivf_dtypes.split(","):
+                configs.append({
+                    "retriever": "ivf",
+                    "params": f"lists={lists} probes={probes} dtype={dtype}",
+                    "build": IVFTrendIndex,
+                    "kwargs": {"lists": lists, "probes": probes, "dtype": dtype, "seed": args.seed}
+                })
+    return configs
+
+
+def evaluate(args) -> Dict:
+    rows, embeddings, client, server = load_source(args)
+    corpus_rows, corpus, query_ids, queries = split_queries(rows, embeddings, args.queries, args.seed)
+    k = args.k
+
+    print(f"[Eval] {len(corpus_rows)} corpus rows, {len(queries)} held-out queries, k={k}")
+    truth = ground_truth(corpus, queries, k)
+    truth_ids = [{corpus_rows[i]["id"] for i in top} for top in truth]
+
+    results = []
+    # IVF centroids only depend on lists, so probes variations share one build
+    built_ivf = {}
+    for config in local_configs(args, corpus):
+        kwargs = config["kwargs"]
+        ivf_key = (kwargs.get("lists"), kwargs.get("dtype"))
+        if config["retriever"] == "ivf" and ivf_key in built_ivf:
+            index, build_seconds = built_ivf[ivf_key]
+            index.probes = kwargs["probes"]
+        else:
+            start = time.perf_counter()
+            index = config["build"](corpus_rows, corpus, **kwargs)
+            build_seconds = time.perf_counter() - start
+            if config["retriever"] == "ivf":
+                built_ivf[ivf_key] = (index, build_seconds)
+
+        scores = measure(lambda query: index.search_batch([query], limit=k, match_threshold=-1.0)[0],
+                         queries, truth_ids, k)
+        scores.update({
+            "retriever": config["retriever"],
+            "params": config["params"],
+            "memory_mb": round(index.memory_bytes() / 1024 / 1024, 2),
+            "build_s": round(build_seconds, 2)
+        })
+        results.append(scores)
+        print(f"[Eval] {config['retriever']} {config['params']}: recall@{k} {scores['recall']}")
+
+    if client is not None:
+        held_out_ids = set(query_ids)
+
+        def rpc_search(query):
+            # Held-out rows are still stored in the table; over-fetch and drop
+            # them so the RPC is scored against the same corpus
+            response = client.rpc("match_fashion_trends", {
+                "query_embedding": query.tolist(),
+                "match_threshold": -1.0,
+                "match_count": k * 2
+            }).execute()
+            matches = [match for match in response.data or [] if match["id"] not in held_out_ids]
+            return matches[:k]
+
+        scores = measure(rpc_search, queries, truth_ids, k)
+        scores.update({"retriever": "rpc", "params": "match_fashion_trends", "memory_mb": None, "build_s": None})
+        results.append(scores)
+        print(f"[Eval] rpc match_fashion_trends: recall@{k} {scores['recall']}")
+
+    if server is not None:
+        server.shutdown()
+
+    return {
+        "settings": {
+            "source": "supabase" if args.supabase else f"synthetic:{args.synthetic}x{args.dimensions}",
+            "corpus_rows": len(corpus_rows),
+            "queries": len(queries),
+            "k": k,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+COLUMNS = ["retriever", "params", "recall", "p50_ms", "p95_ms", "memory_mb", "build_s"]
+
+
+def format_table(report: Dict, fmt: str) -> str:
+    """
+    Markdown or TSV table; one line per configuration in a fixed order
+    """
+    k = report["settings"]["k"]
+    headers = [f"recall@{k}" if column == "recall" else column for column in COLUMNS]
+    lines = []
+    if fmt == "tsv":
+        lines.append("\t".join(headers))
+        for result in report["results"]:
+            lines.append("\t".join("" if result[c] is None else str(result[c]) for c in COLUMNS))
+    else:
+        settings = report["settings"]
+        lines.append(f"Source: {settings['source']}, corpus {settings['corpus_rows']} rows, "
+                     f"{settings['queries']} queries, seed {settings['seed']}\n")
+        lines.append("| " + " | ".join(headers) + " |")
+        lines.append("|" + "|".join("---" for _ in headers) + "|")
+        for result in report["results"]:
+            lines.append("| " + " | ".join("-" if result[c] is None else str(result[c]) for c in COLUMNS) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency evaluation for every retriever")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--synthetic", type=int, default=20000,
+                        help="Evaluate on this many synthetic trends (default)")
+    source.add_argument("--supabase", action="store_true",
+                        help="Evaluate on the stored fashion_embeddings table")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200, help="Held-out query count")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtypes", default="float32,float16,int8", help="Exact index quantizations")
+    parser.add_argument("--lists", default="50,100", help="IVF list counts")
+    parser.add_argument("--probes", default="1,5,10,20", help="IVF probe counts")
+    parser.add_argument("--ivf-dtypes", default="float32", help="IVF quantizations")
+    parser.add_argument("--reduced-dims", default="", help="Two-stage first-stage dimensions, e.g. 128,256")
+    parser.add_argument("--projection-methods", default="pca", help="pca and/or truncate")
+    parser.add_argument("--rerank-factors", default="10", help="Candidates reranked per result")
+    parser.add_argument("--projection", help="Also evaluate a stored projection (.npz)")
+    parser.add_argument("--rpc", action="store_true", help="Also measure the match_fashion_trends RPC")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["markdown", "tsv"], default="markdown")
+    parser.add_argument("--output", help="Write the table to this file")
+    parser.add_argument("--json", help="Write the full report as JSON to this file")
+    args = parser.parse_args()
+
+    report = evaluate(args)
+    table = format_table(report, args.format)
+    print()
+    print(table)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(table)
+        print(f"Table written to {args.output}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
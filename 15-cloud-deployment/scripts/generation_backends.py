@@ -0,0 +1,266 @@
+"""
+Generation Backends
+Interchangeable LLM backends (OpenAI or local Ollama) for the RAG pipeline,
+plus a router that picks one per request
+"""
+
+import threading
+import time
+from typing import List, Dict, Optional
+
+from context_packer import estimate_tokens
+from rate_limiter import RateLimitScheduler, get_scheduler
+from resilience import CircuitBreaker, stage_timeout
+
+try:
+    from ollama_client import OllamaClient
+    OLLAMA_AVAILABLE = True
+except Exception as e:
+    print(f"Warning: Ollama client not available: {e}")
+    OLLAMA_AVAILABLE = False
+
+SYSTEM_PROMPT = "You are an expert fashion stylist."
+
+# Weight of the newest sample in the moving latency average
+LATENCY_SMOOTHING = 0.3
+
+
+class BackendSaturatedError(Exception):
+    """Raised when every backend is at its concurrency limit"""
+
+
+class GenerationBackend:
+    """
+    Base class for an LLM that turns an augmented prompt into recommendations
+
+    Learning Notes:
+    - Each backend tracks how many requests it is serving right now
+      (queue depth) and how long recent requests took (latency)
+    - The router uses those numbers to spread load between backends
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        expected_latency_ms: float = 2000.0,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker(self.name)
+        self.latency_ms = expected_latency_ms
+        self.in_flight = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def complete(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    def is_saturated(self) -> bool:
+        return self.in_flight >= self.max_concurrency
+
+    def try_acquire(self) -> bool:
+        """
+        Reserve a slot, or return False if the backend is already full
+        """
+        with self.lock:
+            if self.in_flight >= self.max_concurrency:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, elapsed_ms: Optional[float]):
+        with self.lock:
+            self.in_flight -= 1
+            if elapsed_ms is None:
+                self.failures += 1
+            else:
+                self.latency_ms += LATENCY_SMOOTHING * (elapsed_ms - self.latency_ms)
+
+    def load_score(self) -> float:
+        """
+        Expected wait: recent latency scaled by how busy the backend is
+        """
+        return self.latency_ms * (1 + self.in_flight)
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "latency_ms": round(self.latency_ms, 1),
+            "failures": self.failures,
+            "circuit": self.breaker.state
+        }
+
+
+class OpenAIBackend(GenerationBackend):
+    """
+    OpenAI chat completions, sent through the shared chat rate limiter
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-3.5-turbo",
+        base_url: str = "https://api.openai.com/v1",
+        max_tokens: int = 500,
+        scheduler: Optional[RateLimitScheduler] = None,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_tokens = max_tokens
+        self.scheduler = scheduler or get_scheduler("chat")
+
+    def complete(self, prompt: str, timeout: float) -> str:
+        url = f"{self.base_url}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": self.max_tokens
+        }
+
+        # The TPM limit counts the prompt plus the completion it may produce
+        tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt) + self.max_tokens
+        response = self.scheduler.post(url, tokens=tokens, timeout=timeout, headers=headers, json=payload)
+        data = response.json()
+        return data["choices"][0]["message"]["content"]
+
+
+class OllamaBackend(GenerationBackend):
+    """
+    Local inference through the Step 10 Ollama client
+    """
+
+    name = "ollama"
+
+    def __init__(self, client, model: str = "llama3.2:1b", **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+        self.model = model
+
+    def complete(self, prompt: str, timeout: float) -> str:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        return self.client.chat(self.model, messages, timeout=timeout)
+
+
+class GenerationRouter:
+    """
+    Picks a backend for every generation request
+
+    Learning Notes:
+    - A query class (e.g. "interactive" or "batch") can pin a preferred backend
+    - Otherwise the backend with the lowest expected wait is chosen
+    - A saturated or failing backend is skipped and the next one is tried
+    - A backend whose circuit breaker is open is skipped without waiting
+    """
+
+    def __init__(self, backends: List[GenerationBackend], routes: Optional[Dict[str, str]] = None):
+        self.backends = backends
+        self.routes = routes or {}
+
+    def candidates(self, query_class: Optional[str] = None) -> List[GenerationBackend]:
+        """
+        Backends in the order they should be tried
+        """
+        ordered = sorted(self.backends, key=lambda backend: backend.load_score())
+        preferred = self.routes.get(query_class) if query_class else None
+        if preferred:
+            ordered.sort(key=lambda backend: backend.name != preferred)
+        return ordered
+
+    def generate(self, prompt: str, query_class: Optional[str] = None) -> Dict:
+        """
+        Run the prompt on the first backend that has capacity and succeeds
+        """
+        # Raises DeadlineExceeded before any backend is tried if time is up
+        stage_timeout("generation")
+        
+        errors = []
+        for backend in self.candidates(query_class):
+            if not backend.breaker.allow():
+                errors.append(f"{backend.name}: circuit open")
+                continue
+            # Each attempt only gets what is left of the budget, so a fallback
+            # after a timeout can't overrun the request deadline
+            timeout = stage_timeout("generation")
+            if not backend.try_acquire():
+                errors.append(f"{backend.name}: saturated")
+                continue
+
+            start = time.perf_counter()
+            elapsed_ms = None
+            try:
+                text = backend.complete(prompt, timeout)
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                backend.breaker.record_success()
+                return {"text": text, "backend": backend.name}
+            except Exception as e:
+                print(f"[RAG] Generation backend {backend.name} failed: {e}")
+                backend.breaker.record_failure()
+                errors.append(f"{backend.name}: {e}")
+            finally:
+                backend.release(elapsed_ms)
+
+        if errors and all(error.endswith("saturated") for error in errors):
+            raise BackendSaturatedError("All generation backends are busy")
+        raise Exception("All generation backends failed: " + "; ".join(errors))
+
+    def status(self) -> List[Dict]:
+        return [backend.status() for backend in self.backends]
+
+
+def build_router(
+    openai_api_key: str,
+    backend_names: List[str],
+    routes: Optional[Dict[str, str]] = None,
+    openai_base_url: str = "https://api.openai.com/v1",
+    openai_breaker: Optional[CircuitBreaker] = None,
+    openai_scheduler: Optional[RateLimitScheduler] = None,
+    ollama_url: str = "http://localhost:11434",
+    ollama_model: str = "llama3.2:1b",
+    openai_concurrency: int = 8,
+    ollama_concurrency: int = 2
+) -> GenerationRouter:
+    """
+    Create the configured backends, skipping Ollama when its client is missing
+    """
+    backends = []
+    for name in backend_names:
+        if name == "openai":
+            backends.append(OpenAIBackend(
+                openai_api_key,
+                base_url=openai_base_url,
+                max_concurrency=openai_concurrency,
+                expected_latency_ms=2000.0,
+                breaker=openai_breaker,
+                scheduler=openai_scheduler
+            ))
+        elif name == "ollama" and OLLAMA_AVAILABLE:
+            backends.append(OllamaBackend(
+                OllamaClient(ollama_url),
+                model=ollama_model,
+                max_concurrency=ollama_concurrency,
+                expected_latency_ms=5000.0
+            ))
+        elif name != "ollama":
+            print(f"Warning: unknown generation backend '{name}'")
+    return GenerationRouter(backends, routes)
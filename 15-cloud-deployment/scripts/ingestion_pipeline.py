@@ -0,0 +1,267 @@
+"""
+Ingestion Pipeline
+Overlaps loading, embedding and storing of fashion trends:
+
+    loader --> [embed queue] --> N embedding workers --> [write queue] --> batching writer
+
+Learning Notes:
+- The queues are bounded: when embedding falls behind, the loader blocks
+  (backpressure) instead of reading the whole file into memory
+- Several embedding requests are in flight at once, while the writer
+  stores finished batches, so network latency overlaps
+- stop() (or Ctrl+C) stops loading new trends; work already queued is
+  finished and flushed before the pipeline returns
+- If the writer fails, the pipeline stops, drops queued batches instead of
+  embedding them, and reports the error (stopped_early=True)
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Marks the end of a queue
+_DONE = object()
+
+
+class StageStats:
+    """
+    Progress counters for one pipeline stage
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, items: int, seconds: float, errors: int = 0):
+        with self.lock:
+            self.items += items
+            self.batches += 1
+            self.errors += errors
+            self.busy_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds else 0.0
+        }
+
+
+class IngestionPipeline:
+    """
+    Staged producer/consumer ingestion
+
+    Args:
+        content_fn: trend -> text to embed (create_content_string)
+        embed_fn: list of texts -> list of embeddings (None for failures)
+        row_fn: (trend, embedding) -> fashion_embeddings row
+        writer: a BulkUpsertWriter (only the writer thread touches it)
+        filter_fn: optional batch filter run by the workers before embedding,
+            e.g. ExistingContentFilter to skip content that is already stored
+        workers: embedding requests in flight at once
+        batch_size: trends per embedding batch
+        queue_size: batches each queue may hold before its producer waits
+    """
+
+    def __init__(
+        self,
+        content_fn: Callable[[Dict], str],
+        embed_fn: Callable[[List[str]], List[Optional[List[float]]]],
+        row_fn: Callable[[Dict, List[float]], Dict],
+        writer,
+        workers: int = 4,
+        batch_size: int = 100,
+        queue_size: int = 8,
+        progress_interval: float = 5.0,
+        filter_fn: Optional[Callable[[List], List]] = None
+    ):
+        self.content_fn = content_fn
+        self.embed_fn = embed_fn
+        self.row_fn = row_fn
+        self.writer = writer
+        self.filter_fn = filter_fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+
+        self.embed_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.write_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.stats = {name: StageStats(name) for name in ("load", "embed", "write")}
+        self.skipped = 0
+        self.skipped_lock = threading.Lock()
+        # Set by the writer thread if it fails; nothing else gets written
+        self.error: Optional[str] = None
+
+    def stop(self):
+        """
+        Stop loading new trends; queued work still finishes
+        """
+        if not self.stop_event.is_set():
+            print("[Ingest] Stopping: finishing queued batches...")
+        self.stop_event.set()
+
+    def put(self, target: queue.Queue, item) -> bool:
+        """
+        Blocking put for the loader; gives up if the pipeline is stopped
+        while waiting (end markers are always delivered)
+        """
+        while True:
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if self.stop_event.is_set() and item is not _DONE:
+                    return False
+
+    def load(self, trends: Iterable[Dict]):
+        batch = []
+        start = time.perf_counter()
+        try:
+            for trend in trends:
+                if self.stop_event.is_set():
+                    break
+                batch.append((trend, self.content_fn(trend)))
+                if len(batch) >= self.batch_size:
+                    seconds = time.perf_counter() - start
+                    if not self.put(self.embed_queue, batch):
+                        batch = []
+                        break
+                    self.stats["load"].record(len(batch), seconds)
+                    batch = []
+                    start = time.perf_counter()
+            if batch and not self.stop_event.is_set():
+                self.stats["load"].record(len(batch), time.perf_counter() - start)
+                self.put(self.embed_queue, batch)
+        except Exception as e:
+            self.stats["load"].record(0, 0.0, errors=1)
+            print(f"[Ingest] Loader failed: {e}")
+            self.stop()
+        finally:
+            for _ in range(self.workers):
+                self.put(self.embed_queue, _DONE)
+
+    def embed(self):
+        while True:
+            batch = self.embed_queue.get()
+            if batch is _DONE:
+                self.write_queue.put(_DONE)
+                return
+            if self.error is not None:
+                # Nothing can be stored any more; don't spend embedding calls
+                continue
+
+            if self.filter_fn is not None:
+                try:
+                    kept = self.filter_fn(batch)
+                except Exception as e:
+                    # Embedding a batch twice is cheaper than losing it
+                    print(f"[Ingest] Filter failed, embedding the whole batch: {e}")
+                    kept = batch
+                with self.skipped_lock:
+                    self.skipped += len(batch) - len(kept)
+                batch = kept
+                if not batch:
+                    continue
+
+            start = time.perf_counter()
+            try:
+                embeddings = self.embed_fn([content for _, content in batch])
+            except Exception as e:
+                print(f"[Ingest] Embedding batch of {len(batch)} failed: {e}")
+                embeddings = [None] * len(batch)
+            failed = sum(1 for embedding in embeddings if embedding is None)
+            self.stats["embed"].record(len(batch) - failed, time.perf_counter() - start, errors=failed)
+
+            results = [(trend, embedding) for (trend, _), embedding in zip(batch, embeddings) if embedding is not None]
+            if results:
+                # The writer always drains, so this only waits, never drops
+                self.write_queue.put(results)
+
+    def write(self):
+        finished_workers = 0
+        try:
+            while finished_workers < self.workers:
+                results = self.write_queue.get()
+                if results is _DONE:
+                    finished_workers += 1
+                    continue
+
+                start = time.perf_counter()
+                failed_before = self.writer.rows_failed
+                for trend, embedding in results:
+                    self.writer.add(self.row_fn(trend, embedding))
+                self.stats["write"].record(
+                    len(results),
+                    time.perf_counter() - start,
+                    errors=self.writer.rows_failed - failed_before
+                )
+
+            start = time.perf_counter()
+            failed_before = self.writer.rows_failed
+            self.writer.flush()
+            self.stats["write"].record(0, time.perf_counter() - start, errors=self.writer.rows_failed - failed_before)
+        except Exception as e:
+            # e.g. row_fn, a write the writer doesn't catch, or the checkpoint
+            # callback failing
+            self.stats["write"].record(0, 0.0, errors=1)
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"[Ingest] Writer failed: {self.error}")
+            self.stop()
+            # Keep taking batches until every worker is done, so none stays
+            # blocked on a full write queue
+            while finished_workers < self.workers:
+                if self.write_queue.get() is _DONE:
+                    finished_workers += 1
+
+    def progress(self) -> str:
+        load, embed, write = (self.stats[name] for name in ("load", "embed", "write"))
+        return (
+            f"[Ingest] loaded {load.items}, skipped {self.skipped}, embedded {embed.items} ({embed.errors} failed), "
+            f"written {self.writer.rows_written} | queues: embed {self.embed_queue.qsize()}, "
+            f"write {self.write_queue.qsize()}"
+        )
+
+    def run(self, trends: Iterable[Dict]) -> Dict:
+        """
+        Ingest every trend and return per-stage metrics
+
+        A writer failure is reported as "error" with stopped_early=True;
+        the rows written before it stay written.
+        """
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self.load, args=(trends,), name="ingest-loader", daemon=True)]
+        threads += [
+            threading.Thread(target=self.embed, name=f"ingest-embed-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        writer_thread = threading.Thread(target=self.write, name="ingest-writer", daemon=True)
+        threads.append(writer_thread)
+        for thread in threads:
+            thread.start()
+
+        last_report = time.perf_counter()
+        while writer_thread.is_alive():
+            try:
+                writer_thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                self.stop()
+            if time.perf_counter() - last_report >= self.progress_interval:
+                print(self.progress())
+                last_report = time.perf_counter()
+
+        elapsed = time.perf_counter() - started
+        report = {name: stats.snapshot() for name, stats in self.stats.items()}
+        report["skipped_unchanged"] = self.skipped
+        report["writer"] = self.writer.stats()
+        report["elapsed_seconds"] = round(elapsed, 2)
+        report["stopped_early"] = self.stop_event.is_set() or self.error is not None
+        report["error"] = self.error
+        return report
@@ -0,0 +1,225 @@
+"""
+Vector Index Maintenance
+Rebuilds the fashion_embeddings ANN index after bulk loads, or switches it
+between ivfflat and HNSW, without blocking searches
+
+Learning Notes:
+- ivfflat picks its cluster centroids when the index is built. The index
+  from 002_create_embeddings_table.sql was built on an empty table, so its
+  centroids say nothing about the data and recall drops as rows arrive;
+  an ivfflat index needs a rebuild after every bulk load
+- HNSW adds each row to its graph on insert, so recall holds up as the
+  table grows; m (links per node) and ef_construction (candidates kept
+  while building) trade build time and memory for recall
+- The new index is built CONCURRENTLY under a temporary name and swapped
+  in, so reads and writes keep going during the build
+- HNSW builds are much faster when the graph fits in maintenance_work_mem
+
+Usage:
+    export DATABASE_URL=postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres
+    python maintain_index.py status
+    python maintain_index.py rebuild                        # HNSW, m=16, ef_construction=64
+    python maintain_index.py rebuild --m 24 --ef-construction 100
+    python maintain_index.py rebuild --method ivfflat       # lists from the row count
+    python maintain_index.py rebuild --storage halfvec      # after 008_convert_embeddings_to_halfvec.sql
+
+Needs asyncpg (pip install asyncpg) and pgvector 0.5.0+ for HNSW.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from typing import List, Dict, Optional
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+# Direct Postgres connection (not the REST URL); CREATE INDEX CONCURRENTLY
+# can't go through PostgREST
+DATABASE_URL = os.getenv("DATABASE_URL")
+EMBEDDINGS_TABLE = "fashion_embeddings"
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+# pgvector's defaults; raise them for better recall at the cost of build time
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+INDEX_MAINTENANCE_WORK_MEM = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "512MB")
+# Column type of the embedding column; picks the operator class
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+EMBEDDING_STORAGE_TYPES = ("vector", "halfvec")
+
+
+def ivfflat_lists(rows: int) -> int:
+    """
+    pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    """
+    if rows > 1_000_000:
+        return int(math.sqrt(rows))
+    return max(10, rows // 1000)
+
+
+def index_name(table: str, method: str) -> str:
+    return f"{table}_embedding_{method}_idx"
+
+
+def index_using(
+    method: str,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    lists: int = 100,
+    storage: str = EMBEDDING_STORAGE
+) -> str:
+    """
+    The USING ... WITH (...) part of the CREATE INDEX statement
+    """
+    if storage not in EMBEDDING_STORAGE_TYPES:
+        raise ValueError(f"Unknown embedding storage '{storage}', expected one of {EMBEDDING_STORAGE_TYPES}")
+    opclass = f"{storage}_cosine_ops"
+    if method == "hnsw":
+        return f"USING hnsw (embedding {opclass}) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    if method == "ivfflat":
+        return f"USING ivfflat (embedding {opclass}) WITH (lists = {int(lists)})"
+    raise ValueError(f"Unknown index method '{method}', expected one of {INDEX_METHODS}")
+
+
+async def vector_indexes(conn, table: str = EMBEDDINGS_TABLE) -> List[Dict]:
+    """
+    Every ivfflat/HNSW index on the table, with its definition and size
+    """
+    rows = await conn.fetch(
+        """
+        SELECT i.indexname, i.indexdef, pg_relation_size(c.oid) AS size
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = i.schemaname
+        WHERE i.tablename = $1
+          AND (i.indexdef ILIKE '%USING hnsw%' OR i.indexdef ILIKE '%USING ivfflat%')
+        ORDER BY i.indexname
+        """,
+        table
+    )
+    return [
+        {"name": row["indexname"], "definition": row["indexdef"], "size_mb": round(row["size"] / 1024 / 1024, 1)}
+        for row in rows
+    ]
+
+
+async def count_rows(conn, table: str = EMBEDDINGS_TABLE) -> int:
+    return await conn.fetchval(f"SELECT count(*) FROM {table}")
+
+
+async def rebuild_index(
+    conn,
+    table: str = EMBEDDINGS_TABLE,
+    method: str = "hnsw",
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    lists: Optional[int] = None,
+    maintenance_work_mem: str = INDEX_MAINTENANCE_WORK_MEM,
+    storage: str = EMBEDDING_STORAGE
+) -> Dict:
+    """
+    Build a fresh ANN index on the table and swap it in for the old ones
+
+    `conn` is an asyncpg connection outside any transaction (CREATE INDEX
+    CONCURRENTLY can't run inside one). With lists=None an ivfflat index is
+    sized from the current row count. `storage` must match the column type.
+    """
+    if conn.is_in_transaction():
+        raise ValueError("rebuild_index can't run inside a transaction")
+
+    rows = await count_rows(conn, table)
+    lists = lists or ivfflat_lists(rows)
+    name = index_name(table, method)
+    building = f"{name}_rebuild"
+    using = index_using(method, m, ef_construction, lists, storage)
+    old_indexes = [index["name"] for index in await vector_indexes(conn, table) if index["name"] != building]
+
+    print(f"[Index] Building {method} index on {table} ({rows} rows): {using}")
+    start = time.perf_counter()
+    await conn.execute(f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+    # Left behind (and invalid) if an earlier rebuild was interrupted
+    await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {building}")
+    await conn.execute(f"CREATE INDEX CONCURRENTLY {building} ON {table} {using}")
+    build_seconds = time.perf_counter() - start
+
+    # Searches use the new index as soon as the old ones are gone
+    for old in old_indexes:
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {old}")
+    await conn.execute(f"ALTER INDEX {building} RENAME TO {name}")
+    await conn.execute(f"ANALYZE {table}")
+    await conn.execute("RESET maintenance_work_mem")
+    size_bytes = await conn.fetchval("SELECT pg_relation_size($1::regclass)", name)
+
+    print(f"[Index] Built {name} in {build_seconds:.1f}s, replaced {old_indexes or 'nothing'}")
+    return {
+        "index": name,
+        "method": method,
+        "definition": using,
+        "rows": rows,
+        "build_seconds": round(build_seconds, 2),
+        "size_mb": round(size_bytes / 1024 / 1024, 1),
+        "replaced": old_indexes
+    }
+
+
+async def run(args):
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        if args.command == "rebuild":
+            result = await rebuild_index(
+                conn,
+                table=args.table,
+                method=args.method,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists or None,
+                maintenance_work_mem=args.maintenance_work_mem,
+                storage=args.storage
+            )
+            print(json.dumps(result, indent=2))
+        print(f"\n{args.table}: {await count_rows(conn, args.table)} rows")
+        for index in await vector_indexes(conn, args.table):
+            print(f"  {index['name']} ({index['size_mb']} MB)")
+            print(f"    {index['definition']}")
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or rebuild the fashion_embeddings vector index")
+    parser.add_argument("--database-url", default=DATABASE_URL,
+                        help="Direct Postgres connection string (default: $DATABASE_URL)")
+    parser.add_argument("--table", default=EMBEDDINGS_TABLE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="List the vector indexes on the table")
+
+    rebuild = commands.add_parser("rebuild", help="Build a new index and swap it in (run after bulk loads)")
+    rebuild.add_argument("--method", choices=INDEX_METHODS, default="hnsw")
+    rebuild.add_argument("--m", type=int, default=HNSW_M, help="HNSW links per node")
+    rebuild.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION,
+                         help="HNSW candidate list size while building")
+    rebuild.add_argument("--lists", type=int, default=0,
+                         help="ivfflat lists (default: from the row count)")
+    rebuild.add_argument("--maintenance-work-mem", default=INDEX_MAINTENANCE_WORK_MEM)
+    rebuild.add_argument("--storage", choices=EMBEDDING_STORAGE_TYPES, default=EMBEDDING_STORAGE,
+                         help="Type of the embedding column (default: $EMBEDDING_STORAGE)")
+    args = parser.parse_args()
+
+    if not ASYNCPG_AVAILABLE:
+        raise SystemExit("asyncpg is required: pip install asyncpg")
+    if not args.database_url:
+        raise SystemExit("Set DATABASE_URL or pass --database-url")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
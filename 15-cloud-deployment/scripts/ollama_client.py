@@ -93,7 +93,8 @@ class OllamaClient:
         self,
         model: str,
         messages: list,
-        stream: bool = False
+        stream: bool = False,
+        timeout: float = 60
     ) -> str:
         """
         Chat with Ollama using conversation history
@@ -102,6 +103,7 @@ class OllamaClient:
             model: Model name
             messages: List of message dicts with "role" and "content"
             stream: Whether to stream the response
+            timeout: Seconds to wait for the response
         
         Returns:
             Generated chat response
@@ -116,7 +118,7 @@ class OllamaClient:
             response = requests.post(
                 self.chat_url,
                 json=payload,
-                timeout=60
+                timeout=timeout
             )
             response.raise_for_status()
             
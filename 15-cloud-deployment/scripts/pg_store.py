@@ -0,0 +1,294 @@
+"""
+Direct Postgres Vector Store
+Optional data path to Postgres through asyncpg instead of PostgREST
+(supabase-py): vector search for RAGPipeline and COPY bulk loads for the
+embedding writer. Select it with VECTOR_BACKEND=postgres.
+
+Learning Notes:
+- Through PostgREST a 1536-dimension query vector travels as ~20 KB of
+  JSON text that Postgres parses again; asyncpg sends pgvector's binary
+  format instead (2 + 2 header bytes, then 4 bytes per float)
+- asyncpg prepares each statement once per connection and reuses it
+  (statement cache), so repeated searches skip parsing and planning
+- The pool keeps connections open, so a search is one round trip with no
+  HTTP or TLS setup
+- asyncpg is async-only; a private event loop in a background thread lets
+  the synchronous pipeline, FastAPI handlers and Celery workers share it
+- Bulk loads use binary COPY into a temporary table, then one
+  INSERT ... ON CONFLICT, so re-runs still update instead of duplicating
+- Prepared statements need a direct connection (port 5432) or a session
+  pooler; behind a transaction-mode pooler (Supabase port 6543) set
+  PG_STATEMENT_CACHE_SIZE=0
+
+Usage:
+    export DATABASE_URL=postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres
+    store = get_vector_store()
+    trends = store.match_trends(query_embedding, match_threshold=0.3, match_count=5)
+
+Needs asyncpg (pip install asyncpg).
+"""
+
+import asyncio
+import json
+import os
+import struct
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Coroutine, List, Dict, Optional, Sequence
+
+import numpy as np
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+# Direct Postgres connection string (not the REST URL)
+DATABASE_URL = os.getenv("DATABASE_URL")
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+# Prepared statements kept per connection (0 disables them)
+PG_STATEMENT_CACHE_SIZE = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+# Server-side limit per statement when the caller gives no timeout
+PG_COMMAND_TIMEOUT = float(os.getenv("PG_COMMAND_TIMEOUT", "10"))
+# Column type of fashion_embeddings.embedding ("vector" or "halfvec")
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+
+EMBEDDINGS_TABLE = "fashion_embeddings"
+RESULT_COLUMNS = "id, content, title, category, season, metadata, similarity"
+
+# Big-endian element type of each pgvector type's binary format
+VECTOR_ELEMENT_TYPES = {"vector": ">f4", "halfvec": ">f2"}
+
+
+def vector_codec(element_type: str):
+    """
+    Encoder/decoder pair for pgvector's binary format: int16 dimensions,
+    int16 unused, then the elements
+    """
+    def encode(value) -> bytes:
+        # Already encoded (see match_trends_batch)
+        if isinstance(value, bytes):
+            return value
+        # Rows built for PostgREST may hold the text form ('[0.1,...]')
+        if isinstance(value, str):
+            value = json.loads(value)
+        array = np.asarray(value, dtype=element_type)
+        return struct.pack(">HH", len(array), 0) + array.tobytes()
+
+    def decode(data: bytes) -> np.ndarray:
+        dimensions, _ = struct.unpack_from(">HH", data)
+        return np.frombuffer(data, dtype=element_type, count=dimensions, offset=4).astype(np.float32)
+
+    return encode, decode
+
+
+async def init_connection(conn):
+    """
+    Register binary codecs for the pgvector types and jsonb on every new
+    pool connection
+    """
+    rows = await conn.fetch(
+        "SELECT typname, typnamespace::regnamespace::text AS schema FROM pg_type WHERE typname = ANY($1::text[])",
+        list(VECTOR_ELEMENT_TYPES)
+    )
+    # The extension may live in "public" or "extensions" (Supabase); halfvec
+    # only exists from pgvector 0.7.0
+    for row in rows:
+        encode, decode = vector_codec(VECTOR_ELEMENT_TYPES[row["typname"]])
+        await conn.set_type_codec(
+            row["typname"], schema=row["schema"], encoder=encode, decoder=decode, format="binary"
+        )
+    # Binary COPY needs a binary jsonb codec: a version byte, then the text
+    await conn.set_type_codec(
+        "jsonb",
+        schema="pg_catalog",
+        encoder=lambda value: b"\x01" + json.dumps(value).encode("utf-8"),
+        decoder=lambda data: json.loads(data[1:]),
+        format="binary"
+    )
+
+
+def record_to_trend(record) -> Dict:
+    """
+    A result row shaped like the PostgREST response (string ids)
+    """
+    trend = dict(record)
+    if trend.get("id") is not None:
+        trend["id"] = str(trend["id"])
+    return trend
+
+
+class PostgresVectorStore:
+    """
+    asyncpg pool behind a synchronous API
+
+    Every public method runs a coroutine on the store's event loop and
+    waits for it, so callers need no asyncio of their own.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = PG_POOL_MIN_SIZE,
+        max_size: int = PG_POOL_MAX_SIZE,
+        statement_cache_size: int = PG_STATEMENT_CACHE_SIZE,
+        command_timeout: float = PG_COMMAND_TIMEOUT,
+        storage: str = EMBEDDING_STORAGE,
+        table: str = EMBEDDINGS_TABLE
+    ):
+        if not ASYNCPG_AVAILABLE:
+            raise RuntimeError("asyncpg is required for VECTOR_BACKEND=postgres: pip install asyncpg")
+        if storage not in VECTOR_ELEMENT_TYPES:
+            raise ValueError(f"Unknown embedding storage '{storage}', expected one of {tuple(VECTOR_ELEMENT_TYPES)}")
+        self.storage = storage
+        self.table = table
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="pg-vector-store", daemon=True)
+        self.thread.start()
+        self.pool = self.run(self.create_pool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            statement_cache_size=statement_cache_size,
+            command_timeout=command_timeout,
+            init=init_connection
+        ))
+
+    async def create_pool(self, dsn: str, **kwargs):
+        # The pool binds to the loop it is created on
+        return await asyncpg.create_pool(dsn, **kwargs)
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the store's loop and wait for its result
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # Cancels the query on the server as well
+            future.cancel()
+            raise
+
+    async def fetch(self, sql: str, *args, timeout: Optional[float] = None) -> list:
+        async with self.pool.acquire() as conn:
+            return await conn.fetch(sql, *args, timeout=timeout)
+
+    def match_trends(
+        self,
+        query_embedding: Sequence[float],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        category: Optional[str] = None,
+        season: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        match_fashion_trends (or match_fashion_trends_filtered when a
+        category/season is given) with a binary query vector
+        """
+        if category or season:
+            sql = (
+                f"SELECT {RESULT_COLUMNS} FROM match_fashion_trends_filtered"
+                f"($1::{self.storage}, $2, $3, $4, $5)"
+            )
+            args = (query_embedding, match_threshold, match_count, category, season)
+        else:
+            sql = f"SELECT {RESULT_COLUMNS} FROM match_fashion_trends($1::{self.storage}, $2, $3, $4, $5)"
+            args = (query_embedding, match_threshold, match_count, probes, ef_search)
+        records = self.run(self.fetch(sql, *args, timeout=timeout), timeout)
+        return [record_to_trend(record) for record in records]
+
+    def match_trends_batch(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        match_threshold: float = 0.3,
+        match_count: int = 5,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[List[Dict]]:
+        """
+        match_fashion_trends_batch: one statement for many query vectors,
+        regrouped per query
+        """
+        sql = (
+            f"SELECT query_index, {RESULT_COLUMNS} FROM match_fashion_trends_batch"
+            f"($1::{self.storage}[], $2, $3, $4, $5)"
+        )
+        # asyncpg would read a list of lists as a two-dimensional array, so
+        # each vector goes in already encoded
+        encode, _ = vector_codec(VECTOR_ELEMENT_TYPES[self.storage])
+        vectors = [encode(embedding) for embedding in query_embeddings]
+        records = self.run(self.fetch(
+            sql, vectors, match_threshold, match_count, probes, ef_search, timeout=timeout
+        ), timeout)
+        results = [[] for _ in query_embeddings]
+        for record in records:
+            trend = record_to_trend(record)
+            results[trend.pop("query_index")].append(trend)
+        return results
+
+    async def copy_upsert_rows(self, rows: List[Dict], table: str, on_conflict: str):
+        columns = list(rows[0].keys())
+        keys = [key.strip() for key in on_conflict.split(",")]
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in keys)
+        staging = f"{table}_load"
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table(
+                    staging,
+                    records=[tuple(row.get(column) for column in columns) for row in rows],
+                    columns=columns
+                )
+                await conn.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"SELECT {', '.join(columns)} FROM {staging} "
+                    f"ON CONFLICT ({', '.join(keys)}) DO "
+                    + (f"UPDATE SET {updates}" if updates else "NOTHING")
+                )
+
+    def copy_upsert(self, rows: List[Dict], table: Optional[str] = None, on_conflict: str = "id"):
+        """
+        Upsert rows with binary COPY (all rows must have the same keys)
+        """
+        if rows:
+            self.run(self.copy_upsert_rows(rows, table or self.table, on_conflict))
+
+    def status(self) -> Dict:
+        return {
+            "backend": "postgres",
+            "storage": self.storage,
+            "pool_size": self.pool.get_size(),
+            "pool_idle": self.pool.get_idle_size()
+        }
+
+    def close(self):
+        self.run(self.pool.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+_store: Optional[PostgresVectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store() -> PostgresVectorStore:
+    """
+    The process-wide store, connected on first use
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if not DATABASE_URL:
+                raise RuntimeError("VECTOR_BACKEND=postgres needs DATABASE_URL (a direct Postgres connection string)")
+            _store = PostgresVectorStore(DATABASE_URL)
+        return _store
@@ -3,18 +3,105 @@ Step 9: RAG Pipeline Module
 Retrieval Augmented Generation for fashion recommendations
 """
 
+import contextvars
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from supabase import create_client, Client
-import requests
+from supabase.lib.client_options import ClientOptions
+
+from context_packer import ContextPacker, estimate_tokens
+from generation_backends import build_router
+from pg_store import get_vector_store
+from rate_limiter import get_scheduler
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, start_deadline, stage_timeout
+from tracing import annotate, traced
+from vector_index import DEFAULT_PROJECTION_PATH, LiveTrendIndex
 
 # Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL", "YOUR_SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "YOUR_SERVICE_ROLE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "YOUR_OPENAI_KEY")
+# Point this at a local stand-in server for offline benchmarks
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# How many LLM generations a batch request runs at the same time
+BATCH_GENERATION_WORKERS = int(os.getenv("RAG_BATCH_GENERATION_WORKERS", "4"))
+
+# Token budgets for the retrieved context pasted into the prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_ITEM_TOKENS = int(os.getenv("RAG_CONTEXT_ITEM_TOKENS", "300"))
+
+# Generation backends, tried in this order when no route applies
+GENERATION_BACKENDS = os.getenv("RAG_GENERATION_BACKENDS", "openai,ollama").split(",")
+# Preferred backend per query class: interactive API calls vs offline batches
+GENERATION_ROUTES = {
+    "interactive": os.getenv("RAG_INTERACTIVE_BACKEND", "openai"),
+    "batch": os.getenv("RAG_BATCH_BACKEND", "ollama")
+}
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:1b")
+
+# Time budget (seconds) for one request, split across embedding, retrieval
+# and generation
+REQUEST_DEADLINE_SECONDS = float(os.getenv("RAG_REQUEST_DEADLINE_SECONDS", "30"))
+BATCH_DEADLINE_SECONDS = float(os.getenv("RAG_BATCH_DEADLINE_SECONDS", "120"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+# Recent query embeddings kept so repeated queries survive an OpenAI outage
+EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "256"))
+
+# How often (seconds) the local batch index polls for new rows; 0 disables it
+INDEX_REFRESH_SECONDS = float(os.getenv("RAG_INDEX_REFRESH_SECONDS", "60"))
+# Appended rows (as a share of the snapshot) that trigger a background rebuild
+INDEX_FRAGMENTATION_THRESHOLD = float(os.getenv("RAG_INDEX_FRAGMENTATION_THRESHOLD", "0.2"))
+# Column the local index polls for new and re-embedded rows
+# (updated_at needs 009_add_updated_at.sql; created_at only sees inserts)
+INDEX_WATERMARK_COLUMN = os.getenv("RAG_INDEX_WATERMARK_COLUMN", "updated_at")
+# Minimum cosine similarity for retrieved trends (match_fashion_trends)
+SIMILARITY_THRESHOLD = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.3"))
+# Per-query ANN search effort: ivfflat.probes / hnsw.ef_search (unset keeps
+# the database setting)
+SEARCH_PROBES = int(os.getenv("RAG_SEARCH_PROBES", "0")) or None
+SEARCH_EF_SEARCH = int(os.getenv("RAG_SEARCH_EF_SEARCH", "0")) or None
+# Batch retrieval: "local" scores queries against the in-memory index,
+# "rpc" sends them to the match_fashion_trends_batch SQL function
+BATCH_RETRIEVAL = os.getenv("RAG_BATCH_RETRIEVAL", "local")
+# Query embeddings per match_fashion_trends_batch call (keeps request bodies small)
+RPC_BATCH_SIZE = int(os.getenv("RAG_RPC_BATCH_SIZE", "64"))
+
+# Column type of fashion_embeddings.embedding ("vector" or "halfvec", see
+# 008_convert_embeddings_to_halfvec.sql); the local index keeps the same
+# precision, so halfvec storage also halves its memory
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector")
+LOCAL_INDEX_DTYPE = "float16" if EMBEDDING_STORAGE == "halfvec" else "float32"
+# Vector search through "supabase" (PostgREST RPC, JSON) or "postgres"
+# (asyncpg over DATABASE_URL with binary vectors, see pg_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "supabase")
+
+# Projection for two-stage local search (written by refit_projection.py);
+# exact full-dimension search is used while the file doesn't exist, and the
+# local index picks up a refitted file on its next refresh
+PROJECTION_PATH = os.getenv("RAG_PROJECTION_PATH", DEFAULT_PROJECTION_PATH)
 
 # Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT_SECONDS)
+)
+
+# One breaker per external dependency, shared by every pipeline instance
+openai_breaker = CircuitBreaker("openai")
+supabase_breaker = CircuitBreaker("supabase")
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """
+    pgvector's text form of an embedding, e.g. '[0.1,0.2,0.3]'
+    """
+    return "[" + ",".join(str(float(value)) for value in embedding) + "]"
 
 
 class RAGPipeline:
@@ -31,12 +118,44 @@ class RAGPipeline:
     def __init__(self):
         self.supabase = supabase
         self.openai_api_key = OPENAI_API_KEY
+        self.local_index: Optional[LiveTrendIndex] = None
+        self.embedding_cache: OrderedDict = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.context_packer = ContextPacker(
+            total_tokens=CONTEXT_TOKEN_BUDGET,
+            item_tokens=CONTEXT_ITEM_TOKENS
+        )
+        self.generation_router = build_router(
+            OPENAI_API_KEY,
+            [name.strip() for name in GENERATION_BACKENDS if name.strip()],
+            routes=GENERATION_ROUTES,
+            openai_base_url=OPENAI_BASE_URL,
+            openai_breaker=openai_breaker,
+            openai_scheduler=get_scheduler("chat"),
+            ollama_url=OLLAMA_URL,
+            ollama_model=OLLAMA_MODEL
+        )
     
+    @traced("embedding")
     def create_embedding(self, text: str) -> List[float]:
         """
         Create embedding for user query
+        
+        Raises an exception instead of returning a meaningless zero vector;
+        recent queries are answered from a small cache when OpenAI is down.
         """
-        url = "https://api.openai.com/v1/embeddings"
+        with self.cache_lock:
+            cached = self.embedding_cache.get(text)
+            if cached is not None:
+                self.embedding_cache.move_to_end(text)
+        if cached is not None:
+            annotate(cache_hit=True)
+            return cached
+        
+        openai_breaker.check()
+        timeout = stage_timeout("embedding")
+        
+        url = f"{OPENAI_BASE_URL}/embeddings"
         headers = {
             "Authorization": f"Bearer {self.openai_api_key}",
             "Content-Type": "application/json"
@@ -48,19 +167,74 @@ class RAGPipeline:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+            # Shares the embeddings RPM/TPM budget; waiting counts against the timeout
+            response = get_scheduler("embeddings").post(
+                url, tokens=estimate_tokens(text), timeout=timeout, headers=headers, json=payload
+            )
             data = response.json()
-            return data["data"][0]["embedding"]
+            embedding = data["data"][0]["embedding"]
         except Exception as e:
+            openai_breaker.record_failure()
             print(f"Error creating embedding: {e}")
-            return [0.0] * 1536
+            raise
+        
+        openai_breaker.record_success()
+        with self.cache_lock:
+            self.embedding_cache[text] = embedding
+            if len(self.embedding_cache) > EMBEDDING_CACHE_SIZE:
+                self.embedding_cache.popitem(last=False)
+        annotate(input_chars=len(text), dimensions=len(embedding))
+        return embedding
+    
+    @traced("embedding")
+    def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Create embeddings for many queries with a single API request
+        
+        Learning Note:
+        - The embeddings endpoint accepts a list of inputs
+        - Each result carries an "index" pointing back to its input
+        """
+        openai_breaker.check()
+        timeout = stage_timeout("embedding")
+        
+        url = f"{OPENAI_BASE_URL}/embeddings"
+        headers = {
+            "Authorization": f"Bearer {self.openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "input": texts,
+            "model": "text-embedding-ada-002"
+        }
+        
+        try:
+            response = get_scheduler("embeddings").post(
+                url,
+                tokens=sum(estimate_tokens(text) for text in texts),
+                timeout=timeout,
+                headers=headers,
+                json=payload
+            )
+            data = response.json()
+            ordered = sorted(data["data"], key=lambda item: item["index"])
+        except Exception as e:
+            openai_breaker.record_failure()
+            print(f"Error creating embeddings: {e}")
+            raise
+        
+        openai_breaker.record_success()
+        annotate(inputs=len(texts), input_chars=sum(len(text) for text in texts))
+        return [item["embedding"] for item in ordered]
     
     def retrieve_similar_trends(
         self, 
         query: str, 
         limit: int = 5,
-        similarity_threshold: float = 0.7
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        category: Optional[str] = None,
+        season: Optional[str] = None
     ) -> List[Dict]:
         """
         STEP 1: RETRIEVE
@@ -70,31 +244,232 @@ class RAGPipeline:
         - We use cosine similarity to measure how close two vectors are
         - Closer vectors = more semantically similar content
         - pgvector extension in Postgres makes this fast
+        - With a category/season filter, match_fashion_trends_filtered narrows
+          the rows (B-tree index) before any distance is computed
+        - VECTOR_BACKEND=postgres calls the same functions over asyncpg
+        - The query is embedded before the retrieval span starts, so its time
+          is counted once, under "embedding"
         """
         # Create embedding for the query
-        query_embedding = self.create_embedding(query)
+        try:
+            query_embedding = self.create_embedding(query)
+        except Exception as e:
+            print(f"[RAG] Query embedding unavailable ({e}), using degraded retrieval")
+            query_embedding = None
+        return self.search_trends(query_embedding, limit, similarity_threshold, category, season)
+    
+    @traced("retrieval")
+    def search_trends(
+        self,
+        query_embedding: Optional[List[float]],
+        limit: int = 5,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        category: Optional[str] = None,
+        season: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Vector search for an already embedded query (degraded retrieval
+        when there is no embedding)
+        """
+        if query_embedding is None:
+            return self.fallback_trends(limit)
         
         try:
-            # Perform vector similarity search using Supabase RPC
-            # The '<->' operator calculates cosine distance
-            response = self.supabase.rpc(
-                'match_fashion_trends',
-                {
+            supabase_breaker.check()
+            # Fail fast when the deadline is already spent
+            timeout = stage_timeout("retrieval")
+            
+            if VECTOR_BACKEND == "postgres":
+                trends = get_vector_store().match_trends(
+                    query_embedding,
+                    match_threshold=similarity_threshold,
+                    match_count=limit,
+                    probes=SEARCH_PROBES,
+                    ef_search=SEARCH_EF_SEARCH,
+                    category=category,
+                    season=season,
+                    timeout=timeout
+                )
+            else:
+                # Perform vector similarity search using Supabase RPC
+                # The '<=>' operator calculates cosine distance; the function
+                # takes the threshold as a similarity
+                params = {
                     'query_embedding': query_embedding,
-                    'match_threshold': 1 - similarity_threshold,  # Convert similarity to distance
+                    'match_threshold': similarity_threshold,
                     'match_count': limit
                 }
-            ).execute()
+                if category or season:
+                    # The filtered function has no probes/ef_search parameters
+                    function = 'match_fashion_trends_filtered'
+                    params['filter_category'] = category
+                    params['filter_season'] = season
+                else:
+                    function = 'match_fashion_trends'
+                    if SEARCH_PROBES:
+                        params['probes'] = SEARCH_PROBES
+                    if SEARCH_EF_SEARCH:
+                        params['ef_search'] = SEARCH_EF_SEARCH
+                response = self.supabase.rpc(function, params).execute()
+                trends = response.data if response.data else []
+            supabase_breaker.record_success()
             
-            return response.data if response.data else []
+            annotate(rows=len(trends))
+            return trends
             
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"[RAG] Skipping vector search: {e}")
+            annotate(rows=0, skipped=True)
+            return []
         except Exception as e:
+            supabase_breaker.record_failure()
             print(f"Error retrieving trends: {e}")
-            # Fallback to simple query without vector search
+            return self.fallback_trends(limit)
+    
+    def fallback_trends(self, limit: int = 5) -> List[Dict]:
+        """
+        Degraded retrieval: a simple query without vector search
+        """
+        if not supabase_breaker.allow():
+            annotate(rows=0, skipped=True)
+            return []
+        try:
             response = self.supabase.table("fashion_embeddings").select("*").limit(limit).execute()
-            return response.data if response.data else []
+            supabase_breaker.record_success()
+        except Exception as e:
+            supabase_breaker.record_failure()
+            print(f"Error loading fallback trends: {e}")
+            return []
+        trends = response.data if response.data else []
+        annotate(rows=len(trends), fallback=True)
+        return trends
     
-    def augment_prompt(self, query: str, retrieved_trends: List[Dict]) -> str:
+    def get_local_index(self) -> LiveTrendIndex:
+        """
+        Load the in-memory trend index the first time a batch needs it,
+        then keep it up to date by polling for new rows
+        """
+        if self.local_index is None:
+            supabase_breaker.check()
+            index = LiveTrendIndex(
+                self.supabase,
+                dtype=LOCAL_INDEX_DTYPE,
+                projection_path=PROJECTION_PATH,
+                fragmentation_threshold=INDEX_FRAGMENTATION_THRESHOLD,
+                watermark_column=INDEX_WATERMARK_COLUMN
+            )
+            try:
+                index.refresh()
+            except Exception:
+                supabase_breaker.record_failure()
+                raise
+            supabase_breaker.record_success()
+            if INDEX_REFRESH_SECONDS > 0:
+                index.start_polling(INDEX_REFRESH_SECONDS)
+            self.local_index = index
+        return self.local_index
+    
+    @traced("retrieval")
+    def retrieve_similar_trends_batch(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 5,
+        similarity_threshold: float = SIMILARITY_THRESHOLD
+    ) -> List[List[Dict]]:
+        """
+        STEP 1 (batch): RETRIEVE for many queries at once
+        
+        Learning Note:
+        - Every query is scored against every trend in one matrix product
+        - This replaces one match_fashion_trends RPC per query
+        """
+        index = self.get_local_index()
+        # Same threshold the match_fashion_trends RPC receives, so batch and
+        # single-query retrieval return the same trends
+        results = index.search_batch(
+            query_embeddings,
+            limit=limit,
+            match_threshold=similarity_threshold
+        )
+        annotate(queries=len(query_embeddings), rows=sum(len(trends) for trends in results))
+        return results
+    
+    @traced("retrieval")
+    def retrieve_similar_trends_batch_rpc(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 5,
+        similarity_threshold: float = SIMILARITY_THRESHOLD
+    ) -> List[List[Dict]]:
+        """
+        STEP 1 (batch): RETRIEVE for many queries with match_fashion_trends_batch
+        
+        Learning Note:
+        - One RPC per RPC_BATCH_SIZE queries instead of one per query
+        - The database's ANN index does the search, so nothing is loaded
+          into memory (unlike retrieve_similar_trends_batch)
+        - Rows come back tagged with query_index and are regrouped per query
+        - VECTOR_BACKEND=postgres sends the chunk over asyncpg as binary vectors
+        """
+        results = [[] for _ in query_embeddings]
+        supabase_breaker.check()
+        for start in range(0, len(query_embeddings), RPC_BATCH_SIZE):
+            timeout = stage_timeout("retrieval")
+            chunk = query_embeddings[start:start + RPC_BATCH_SIZE]
+            try:
+                if VECTOR_BACKEND == "postgres":
+                    chunk_results = get_vector_store().match_trends_batch(
+                        chunk,
+                        match_threshold=similarity_threshold,
+                        match_count=limit,
+                        probes=SEARCH_PROBES,
+                        ef_search=SEARCH_EF_SEARCH,
+                        timeout=timeout
+                    )
+                else:
+                    chunk_results = self.match_trends_batch_rpc(chunk, limit, similarity_threshold)
+            except Exception:
+                supabase_breaker.record_failure()
+                raise
+            supabase_breaker.record_success()
+            results[start:start + len(chunk)] = chunk_results
+        
+        annotate(queries=len(query_embeddings), rows=sum(len(trends) for trends in results))
+        return results
+    
+    def match_trends_batch_rpc(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int,
+        similarity_threshold: float
+    ) -> List[List[Dict]]:
+        """
+        One match_fashion_trends_batch call through PostgREST
+        """
+        # Text literals: a JSON array of arrays isn't a vector[]
+        params = {
+            'query_embeddings': [vector_literal(embedding) for embedding in query_embeddings],
+            'match_threshold': similarity_threshold,
+            'match_count': limit
+        }
+        if SEARCH_PROBES:
+            params['probes'] = SEARCH_PROBES
+        if SEARCH_EF_SEARCH:
+            params['ef_search'] = SEARCH_EF_SEARCH
+        response = self.supabase.rpc('match_fashion_trends_batch', params).execute()
+        
+        results = [[] for _ in query_embeddings]
+        for row in response.data or []:
+            results[row.pop('query_index')].append(row)
+        return results
+    
+    @traced("augment")
+    def augment_prompt(
+        self,
+        query: str,
+        retrieved_trends: List[Dict],
+        packed_context: Optional[Dict] = None
+    ) -> str:
         """
         STEP 2: AUGMENT
         Create an enriched prompt by combining user query with retrieved context
@@ -103,14 +478,12 @@ class RAGPipeline:
         - We give the LLM relevant background information
         - This grounds the response in factual data
         - Reduces hallucinations and improves accuracy
+        - The context is packed into a token budget so prompt size (and LLM
+          latency and cost) doesn't grow with document size
         """
-        context = "\n\n".join([
-            f"Trend: {trend.get('title', 'N/A')}\n"
-            f"Category: {trend.get('category', 'N/A')}\n"
-            f"Season: {trend.get('season', 'N/A')}\n"
-            f"Details: {trend.get('content', 'N/A')}"
-            for trend in retrieved_trends
-        ])
+        if packed_context is None:
+            packed_context = self.context_packer.pack(retrieved_trends)
+        context = packed_context["context"]
         
         augmented_prompt = f"""You are an expert fashion stylist and trend advisor. 
 Based on the following current fashion trends, provide personalized recommendations.
@@ -128,9 +501,15 @@ Please provide:
 
 Be creative, specific, and personalized. Use the trend data to inform your recommendations."""
         
+        annotate(
+            prompt_chars=len(augmented_prompt),
+            context_tokens=packed_context["stats"]["tokens_after"],
+            tokens_saved=packed_context["stats"]["tokens_saved"]
+        )
         return augmented_prompt
     
-    def generate_recommendations(self, prompt: str) -> str:
+    @traced("generation")
+    def generate_recommendations(self, prompt: str, query_class: str = "interactive") -> str:
         """
         STEP 3: GENERATE
         Use LLM to create personalized fashion recommendations
@@ -139,51 +518,132 @@ Be creative, specific, and personalized. Use the trend data to inform your recom
         - We use the augmented prompt with retrieved context
         - The LLM generates a response based on real trend data
         - This is more accurate than asking the LLM without context
+        - The router sends the prompt to OpenAI or local Ollama depending on
+          the query class, recent latency and how busy each backend is
         """
-        url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {"role": "system", "content": "You are an expert fashion stylist."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 500
-        }
-        
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+            result = self.generation_router.generate(prompt, query_class)
+            annotate(
+                prompt_chars=len(prompt),
+                response_chars=len(result["text"]),
+                backend=result["backend"]
+            )
+            return result["text"]
         except Exception as e:
             print(f"Error generating recommendations: {e}")
             return "Unable to generate recommendations at this time. Please try again later."
     
-    def get_recommendations(self, user_query: str) -> Dict:
+    def get_recommendations(
+        self,
+        user_query: str,
+        limit: int = 5,
+        deadline_seconds: Optional[float] = None,
+        category: Optional[str] = None,
+        season: Optional[str] = None
+    ) -> Dict:
         """
         Complete RAG pipeline: Retrieve → Augment → Generate
+        Optionally restricted to trends of one category and/or season
+        """
+        with start_deadline(deadline_seconds or REQUEST_DEADLINE_SECONDS):
+            print(f"\n[RAG] Processing query: {user_query}")
+            
+            # Step 1: Retrieve similar trends
+            print("[RAG] Step 1: Retrieving similar trends...")
+            retrieved_trends = self.retrieve_similar_trends(
+                user_query, limit=limit, category=category, season=season
+            )
+            print(f"[RAG] Found {len(retrieved_trends)} similar trends")
+            
+            # Step 2: Augment prompt with context
+            print("[RAG] Step 2: Augmenting prompt with context...")
+            packed_context = self.context_packer.pack(retrieved_trends)
+            augmented_prompt = self.augment_prompt(user_query, retrieved_trends, packed_context)
+            print(f"[RAG] Context uses {packed_context['stats']['tokens_after']} tokens "
+                  f"(saved {packed_context['stats']['tokens_saved']})")
+            
+            # Step 3: Generate recommendations
+            print("[RAG] Step 3: Generating personalized recommendations...")
+            recommendations = self.generate_recommendations(augmented_prompt)
+            
+            # Report only the trends the LLM actually saw
+            return self.format_result(
+                user_query, packed_context["trends"], recommendations, packed_context["stats"]
+            )
+    
+    def get_recommendations_batch(
+        self,
+        user_queries: List[str],
+        limit: int = 5,
+        deadline_seconds: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Batch RAG pipeline for offline jobs (e.g. newsletter segments)
+            
+        Learning Note:
+        - One embeddings request for all queries
+        - One batched vector search for all queries (in memory, or in the
+          database with RAG_BATCH_RETRIEVAL=rpc)
+        - LLM generations run concurrently in a thread pool
+        - The whole batch shares one deadline
+        """
+        if not user_queries:
+            return []
+            
+        print(f"\n[RAG] Processing batch of {len(user_queries)} queries")
+            
+        with start_deadline(deadline_seconds or BATCH_DEADLINE_SECONDS):
+            print("[RAG] Step 1: Embedding all queries in one request...")
+            try:
+                query_embeddings = self.create_embeddings(user_queries)
+                
+                print("[RAG] Step 1: Retrieving similar trends for all queries...")
+                if BATCH_RETRIEVAL == "rpc":
+                    retrieved_batch = self.retrieve_similar_trends_batch_rpc(query_embeddings, limit=limit)
+                else:
+                    retrieved_batch = self.retrieve_similar_trends_batch(query_embeddings, limit=limit)
+            except Exception as e:
+                print(f"[RAG] Batch retrieval unavailable ({e}), using degraded retrieval")
+                fallback = self.fallback_trends(limit)
+                retrieved_batch = [fallback for _ in user_queries]
+            
+            print("[RAG] Step 2: Augmenting prompts with context...")
+            packed_batch = [self.context_packer.pack(trends) for trends in retrieved_batch]
+            prompts = [
+                self.augment_prompt(query, trends, packed)
+                for query, trends, packed in zip(user_queries, retrieved_batch, packed_batch)
+            ]
+            
+            print("[RAG] Step 3: Generating recommendations concurrently...")
+            workers = max(1, min(BATCH_GENERATION_WORKERS, len(prompts)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Copy the request context into each thread so generation spans
+                # land on the same trace
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self.generate_recommendations, prompt, "batch"
+                    )
+                    for prompt in prompts
+                ]
+                recommendations = [future.result() for future in futures]
+            
+            return [
+                self.format_result(query, packed["trends"], recommendation, packed["stats"])
+                for query, recommendation, packed in zip(user_queries, recommendations, packed_batch)
+            ]
+    
+    def format_result(
+        self,
+        user_query: str,
+        retrieved_trends: List[Dict],
+        recommendations: str,
+        context_stats: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Shape a pipeline result for API responses
+        `retrieved_trends` should be the packed trends, so the list matches
+        the context the LLM was given and `context_stats`
         """
-        print(f"\n[RAG] Processing query: {user_query}")
-        
-        # Step 1: Retrieve similar trends
-        print("[RAG] Step 1: Retrieving similar trends...")
-        retrieved_trends = self.retrieve_similar_trends(user_query, limit=5)
-        print(f"[RAG] Found {len(retrieved_trends)} similar trends")
-        
-        # Step 2: Augment prompt with context
-        print("[RAG] Step 2: Augmenting prompt with context...")
-        augmented_prompt = self.augment_prompt(user_query, retrieved_trends)
-        
-        # Step 3: Generate recommendations
-        print("[RAG] Step 3: Generating personalized recommendations...")
-        recommendations = self.generate_recommendations(augmented_prompt)
-        
         return {
             "query": user_query,
             "retrieved_trends": [
@@ -194,7 +654,8 @@ Be creative, specific, and personalized. Use the trend data to inform your recom
                 }
                 for trend in retrieved_trends
             ],
-            "recommendations": recommendations
+            "recommendations": recommendations,
+            "context_stats": context_stats
         }
 
 
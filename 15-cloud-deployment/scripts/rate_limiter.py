@@ -0,0 +1,328 @@
+"""
+Client-Side Rate Limiting
+Schedules OpenAI requests against the account's request-per-minute (RPM)
+and token-per-minute (TPM) limits, so ingestion runs close to its quota
+without being throttled, and the RAG pipeline shares that quota fairly
+
+Learning Notes:
+- Two token buckets (requests and tokens) refill continuously; a request
+  waits until both have room for it
+- The x-ratelimit-* response headers tell us the real limits and what is
+  left, so the buckets follow the server instead of a guess
+- Concurrency adapts AIMD-style (like TCP): +1 slot per window of
+  successful requests, halved when a 429 comes back
+- 429 and 5xx responses are retried with full-jitter exponential backoff,
+  honouring Retry-After when the server sends it
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+# Client-side budgets per OpenAI endpoint; set them to your account's
+# limits (the response headers correct them at runtime)
+OPENAI_LIMITS = {
+    "embeddings": {
+        "requests_per_minute": int(os.getenv("OPENAI_EMBEDDING_RPM", "3000")),
+        "tokens_per_minute": int(os.getenv("OPENAI_EMBEDDING_TPM", "1000000"))
+    },
+    "chat": {
+        "requests_per_minute": int(os.getenv("OPENAI_CHAT_RPM", "3500")),
+        "tokens_per_minute": int(os.getenv("OPENAI_CHAT_TPM", "90000"))
+    }
+}
+# Upper bound for the adaptive number of requests in flight per endpoint
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+
+# Request timeout (seconds) when the caller gives no deadline
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request can't get a slot before its deadline"""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds in a header such as "1s", "6m0s", "20ms" or a plain "2"
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    How long the server asked us to wait, if it said so
+    """
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+class Budget:
+    """
+    Token bucket holding up to `per_minute` units, refilled at per_minute / 60
+    units per second; a limit of 0 means unlimited
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available (0 if they are now)
+        """
+        if not self.capacity:
+            return 0.0
+        self.refill(now)
+        # A request bigger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """
+        Follow the server's view of this limit
+
+        The reset headers give the time until the bucket is full again, not
+        until the next request fits, so the refill rate stays limit / 60
+        """
+        if limit:
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self.refill(now)
+            self.level = min(self.level, remaining)
+
+
+def header_number(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """
+    Shared gate in front of one rate-limited endpoint
+
+    Usage:
+        scheduler = get_scheduler("embeddings")
+        response = scheduler.post(url, tokens=1200, headers=headers, json=payload, timeout=10)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.name = name
+        self.requests = Budget(requests_per_minute)
+        self.tokens = Budget(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.in_flight = 0
+        # Requests wait here when the server asked everyone to back off
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+        self.sent = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self, tokens: float, timeout: Optional[float] = None) -> float:
+        """
+        Block until a request of `tokens` tokens may be sent; returns the
+        time it was admitted
+        """
+        start = time.monotonic()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.in_flight < int(self.concurrency):
+                    wait = max(
+                        self.requests.wait_time(1, now),
+                        self.tokens.wait_time(tokens, now),
+                        self.paused_until - now
+                    )
+                    if wait <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        self.in_flight += 1
+                        self.sent += 1
+                        self.wait_seconds += now - start
+                        return now
+                else:
+                    # Woken up by release()
+                    wait = None
+
+                if timeout is not None:
+                    left = start + timeout - now
+                    if left <= 0:
+                        raise RateLimitTimeout(f"{self.name}: no request slot within {timeout:.1f}s")
+                    wait = left if wait is None else min(wait, left)
+                self.condition.wait(wait)
+
+    def release(self, admitted_at: float, response: Optional[requests.Response]):
+        """
+        Free the slot and learn from the response
+        """
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if response is not None:
+                headers = response.headers
+                self.requests.sync(
+                    header_number(headers, "x-ratelimit-limit-requests"),
+                    header_number(headers, "x-ratelimit-remaining-requests"),
+                    now
+                )
+                self.tokens.sync(
+                    header_number(headers, "x-ratelimit-limit-tokens"),
+                    header_number(headers, "x-ratelimit-remaining-tokens"),
+                    now
+                )
+
+                if response.status_code == 429:
+                    self.throttled += 1
+                    retry_after = retry_after_seconds(headers)
+                    if retry_after:
+                        self.paused_until = max(self.paused_until, now + retry_after)
+                    # Only one halving per round: requests admitted before the
+                    # last decrease were sent at the old concurrency
+                    if admitted_at >= self.last_decrease:
+                        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                        self.last_decrease = now
+                        print(f"[RateLimit] {self.name} throttled; concurrency -> {int(self.concurrency)}")
+                elif response.status_code < 400:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.condition.notify_all()
+
+    def backoff(self, attempt: int, response: requests.Response) -> float:
+        """
+        Full-jitter exponential backoff, never shorter than Retry-After
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        retry_after = retry_after_seconds(response.headers)
+        return max(delay, retry_after or 0.0)
+
+    def post(
+        self,
+        url: str,
+        tokens: float = 1,
+        timeout: Optional[float] = None,
+        session: Optional[requests.Session] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        requests.post under the rate limits, retrying 429 and 5xx responses
+
+        `timeout` covers queueing, retries and the request itself; the final
+        response is returned with raise_for_status() already applied.
+        Pass a `session` to reuse pooled connections.
+        """
+        http = session or requests
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(self.max_retries + 1):
+            left = None if deadline is None else deadline - time.monotonic()
+            admitted_at = self.acquire(tokens, left)
+            response = None
+            try:
+                left = DEFAULT_REQUEST_TIMEOUT if deadline is None else max(deadline - time.monotonic(), 0.001)
+                response = http.post(url, timeout=left, **kwargs)
+            finally:
+                self.release(admitted_at, response)
+
+            if response.status_code != 429 and response.status_code < 500:
+                break
+            delay = self.backoff(attempt, response)
+            if attempt == self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                break
+            with self.condition:
+                self.retries += 1
+            time.sleep(delay)
+
+        response.raise_for_status()
+        return response
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "requests_per_minute": int(self.requests.capacity),
+            "tokens_per_minute": int(self.tokens.capacity),
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "wait_seconds": round(self.wait_seconds, 2)
+        }
+
+
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(endpoint: str) -> RateLimitScheduler:
+    """
+    The process-wide scheduler for an OpenAI endpoint ("embeddings" or "chat"),
+    shared by ingestion, the RAG pipeline and generation backends
+    """
+    with _schedulers_lock:
+        if endpoint not in _schedulers:
+            limits = OPENAI_LIMITS.get(endpoint, {})
+            _schedulers[endpoint] = RateLimitScheduler(
+                f"openai-{endpoint}",
+                max_concurrency=OPENAI_MAX_CONCURRENCY,
+                max_retries=OPENAI_MAX_RETRIES,
+                **limits
+            )
+        return _schedulers[endpoint]
+
+
+def scheduler_status() -> list:
+    with _schedulers_lock:
+        return [scheduler.status() for scheduler in _schedulers.values()]
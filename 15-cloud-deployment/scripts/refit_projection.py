@@ -0,0 +1,130 @@
+"""
+Projection Maintenance Job
+Refits the reduced-dimension projection used by two-stage local search
+and checks its recall before replacing the stored one
+
+Usage:
+    python refit_projection.py
+    python refit_projection.py --method pca --dimensions 256 --sample 50000
+    python refit_projection.py --method truncate --dimensions 512
+    python refit_projection.py --synthetic 20000 --output /tmp/projection.npz
+"""
+
+import argparse
+import os
+from typing import Dict
+
+import numpy as np
+
+from vector_index import (
+    DEFAULT_PROJECTION_PATH,
+    RERANK_FACTOR,
+    LocalTrendIndex,
+    Projection,
+    load_trend_embeddings
+)
+
+
+def load_embeddings(synthetic: int = 0, dimensions: int = 1536):
+    """
+    Stored trend rows and embeddings, or a synthetic corpus for dry runs
+    """
+    if synthetic:
+        from stub_services import SyntheticCorpus
+        corpus = SyntheticCorpus(synthetic, dimensions)
+        return [corpus.row(i) for i in range(corpus.rows)], corpus.matrix
+
+    from supabase import create_client
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+    return load_trend_embeddings(client)
+
+
+def check_recall(
+    projection: Projection,
+    rows,
+    embeddings: np.ndarray,
+    queries: int = 200,
+    k: int = 10,
+    rerank_factor: int = RERANK_FACTOR
+) -> float:
+    """
+    recall@k of two-stage search against exact search on held-out rows
+    """
+    from evaluate_retrieval import split_queries, ground_truth, measure
+
+    corpus_rows, corpus, _, query_vectors = split_queries(rows, embeddings, queries, seed=0)
+    truth = ground_truth(corpus, query_vectors, k)
+    truth_ids = [{corpus_rows[i]["id"] for i in top} for top in truth]
+
+    index = LocalTrendIndex(corpus_rows, corpus, projection=projection, rerank_factor=rerank_factor)
+    scores = measure(
+        lambda query: index.search_batch([query], limit=k, match_threshold=-1.0)[0],
+        query_vectors, truth_ids, k
+    )
+    return scores["recall"]
+
+
+def refit_projection(
+    method: str = "pca",
+    dimensions: int = 256,
+    sample: int = 50000,
+    output: str = DEFAULT_PROJECTION_PATH,
+    min_recall: float = 0.95,
+    synthetic: int = 0
+) -> Dict:
+    """
+    Fit a projection, check it, and store it if recall is good enough
+    """
+    rows, embeddings = load_embeddings(synthetic)
+    if len(rows) < 2:
+        return {"status": "skipped", "reason": "not enough embeddings", "rows": len(rows)}
+
+    if method == "pca":
+        projection = Projection.fit_pca(embeddings, dimensions, sample=sample)
+    else:
+        projection = Projection.truncate(dimensions)
+
+    recall = check_recall(projection, rows, embeddings)
+    projection.metadata["recall_at_10"] = recall
+    print(f"[Projection] {projection.describe()} recall@10 {recall}")
+
+    if recall < min_recall:
+        print(f"[Projection] Recall below {min_recall}; keeping the stored projection")
+        return {"status": "rejected", "projection": projection.describe(), "recall": recall}
+
+    projection.save(output)
+    print(f"[Projection] Saved to {output}")
+    return {
+        "status": "success",
+        "projection": projection.describe(),
+        "recall": recall,
+        "rows": len(rows),
+        "path": output
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refit the two-stage search projection")
+    parser.add_argument("--method", choices=["pca", "truncate"], default="pca")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--sample", type=int, default=50000, help="Rows used to fit PCA")
+    parser.add_argument("--min-recall", type=float, default=0.95,
+                        help="Don't replace the stored projection below this recall@10")
+    parser.add_argument("--output", default=os.getenv("RAG_PROJECTION_PATH", DEFAULT_PROJECTION_PATH))
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Fit on a synthetic corpus instead of Supabase (dry run)")
+    args = parser.parse_args()
+
+    result = refit_projection(
+        method=args.method,
+        dimensions=args.dimensions,
+        sample=args.sample,
+        output=args.output,
+        min_recall=args.min_recall,
+        synthetic=args.synthetic
+    )
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Resilience Helpers
+Per-request deadlines split across pipeline stages, and circuit breakers
+for the services the RAG pipeline depends on (OpenAI, Supabase, Ollama)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Relative share of the remaining time each stage may use
+STAGE_WEIGHTS = {
+    "embedding": 1.0,
+    "retrieval": 1.5,
+    "generation": 5.0
+}
+STAGE_ORDER = ["embedding", "retrieval", "generation"]
+
+# Timeouts (seconds) used when a call runs outside any request deadline
+DEFAULT_TIMEOUTS = {
+    "embedding": 10.0,
+    "retrieval": 10.0,
+    "generation": 60.0
+}
+
+_current_deadline: ContextVar[Optional["Deadline"]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has no time left for the next stage"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+
+class Deadline:
+    """
+    Time budget for one request
+
+    Learning Notes:
+    - Each stage gets a slice of the time that is *left*, weighted by how
+      long that stage usually takes compared with the stages after it
+    - Time a fast stage doesn't use rolls over to the later stages
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def timeout_for(self, stage: str) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"No time left for {stage} (deadline {self.seconds}s)")
+
+        if stage not in STAGE_ORDER:
+            return remaining
+        later = STAGE_ORDER[STAGE_ORDER.index(stage):]
+        share = STAGE_WEIGHTS[stage] / sum(STAGE_WEIGHTS[name] for name in later)
+        return remaining * share
+
+
+@contextmanager
+def start_deadline(seconds: float):
+    """
+    Give every outbound call made inside this block a shared deadline
+    """
+    token = _current_deadline.set(Deadline(seconds))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+def stage_timeout(stage: str) -> float:
+    """
+    Timeout (seconds) for the next outbound call of a stage
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return DEFAULT_TIMEOUTS.get(stage, 30.0)
+    return deadline.timeout_for(stage)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after repeated failures
+
+    Learning Notes:
+    - CLOSED: calls go through; consecutive failures are counted
+    - OPEN: calls fail immediately for `reset_timeout` seconds
+    - HALF_OPEN: one trial call decides whether to close or reopen
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may be attempted right now
+        """
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let one trial request through per reset period
+                self.state = "half_open"
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def check(self):
+        """
+        Raise CircuitOpenError if the dependency should not be called
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"[Breaker] {self.name} circuit opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "failures": self.failures
+        }
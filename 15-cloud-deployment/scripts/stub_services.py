@@ -0,0 +1,416 @@
+"""
+Local Stand-in Services
+Tiny HTTP servers that imitate the OpenAI embeddings/chat endpoints and the
+Supabase (PostgREST) endpoints used by the RAG pipeline, so benchmarks can
+run offline with repeatable results
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from rate_limiter import Budget
+
+CATEGORIES = ["Style Guide", "Trends", "Eco-Friendly", "Runway", "Streetwear", "Beauty"]
+SEASONS = ["Spring 2025", "Summer 2025", "Fall 2025", "Winter 2025", "All Seasons"]
+
+# A dummy key in the JWT shape supabase-py expects
+STUB_API_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.c3R1Yg"
+
+
+def text_seed(text: str) -> int:
+    """
+    Stable 64-bit seed derived from a piece of text
+    """
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class SyntheticCorpus:
+    """
+    A fake fashion_embeddings table with `rows` deterministic trends
+
+    Learning Note:
+    - Trends are scattered around a fixed set of topic centroids, and query
+      embeddings land near one of them, so searches return realistic
+      similarities instead of random noise
+    - Vectors are generated in chunks to keep peak memory close to the
+      final matrix size
+    - 1M rows x 1536 dims is ~6 GB of float32; use fewer dimensions for
+      the largest corpora on small machines
+    """
+
+    def __init__(
+        self,
+        rows: int,
+        dimensions: int = 1536,
+        topics: int = 64,
+        noise: float = 0.8,
+        seed: int = 42,
+        chunk_size: int = 100_000
+    ):
+        self.rows = rows
+        self.dimensions = dimensions
+        self.noise = noise
+
+        rng = np.random.default_rng(seed)
+        self.centroids = rng.standard_normal((topics, dimensions), dtype=np.float32)
+        self.centroids /= np.linalg.norm(self.centroids, axis=1, keepdims=True)
+
+        self.matrix = np.empty((rows, dimensions), dtype=np.float32)
+        for start in range(0, rows, chunk_size):
+            end = min(start + chunk_size, rows)
+            chunk = rng.standard_normal((end - start, dimensions), dtype=np.float32)
+            chunk *= noise / np.sqrt(dimensions)
+            chunk += self.centroids[np.arange(start, end) % topics]
+            chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+            self.matrix[start:end] = chunk
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Deterministic embedding: the same text always maps to the same vector,
+        placed near one of the corpus topics
+        """
+        seed = text_seed(text)
+        rng = np.random.default_rng(seed)
+        vector = self.centroids[seed % len(self.centroids)].copy()
+        vector += rng.standard_normal(self.dimensions).astype(np.float32) * self.noise / np.sqrt(self.dimensions)
+        return vector / np.linalg.norm(vector)
+
+    def row(self, index: int, include_embedding: bool = False) -> Dict:
+        title = f"Synthetic Trend {index}"
+        category = CATEGORIES[index % len(CATEGORIES)]
+        season = SEASONS[index % len(SEASONS)]
+        row = {
+            "id": f"00000000-0000-0000-0000-{index:012d}",
+            "content": (
+                f"Title: {title}\nCategory: {category}\nSeason: {season}\n"
+                f"Description: Generated trend number {index} for offline benchmarks"
+            ),
+            "title": title,
+            "category": category,
+            "season": season,
+            "metadata": {"title": title, "category": category, "season": season}
+        }
+        if include_embedding:
+            row["embedding"] = json.dumps(self.matrix[index].round(6).tolist())
+        return row
+
+    def search(
+        self,
+        query: List[float],
+        match_threshold: float,
+        match_count: int,
+        category: Optional[str] = None,
+        season: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Exact cosine search, mirroring the match_fashion_trends SQL function
+        (and match_fashion_trends_filtered when a category/season is given;
+        match_fashion_trends_batch runs it once per query)
+        """
+        query_vector = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm == 0 or self.rows == 0:
+            return []
+        similarities = self.matrix @ (query_vector / norm)
+
+        indices = np.arange(self.rows)
+        if category is not None:
+            indices = indices[np.array(CATEGORIES)[indices % len(CATEGORIES)] == category]
+        if season is not None:
+            indices = indices[np.array(SEASONS)[indices % len(SEASONS)] == season]
+        if category is not None or season is not None:
+            masked = np.full(self.rows, -np.inf, dtype=np.float32)
+            masked[indices] = similarities[indices]
+            similarities = masked
+
+        k = min(match_count, self.rows)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+
+        results = []
+        for index in top:
+            similarity = float(similarities[index])
+            if similarity <= match_threshold:
+                continue
+            row = self.row(int(index))
+            row["similarity"] = similarity
+            results.append(row)
+        return results
+
+
+class StubConfig:
+    """
+    Latencies (milliseconds) and data shared by the stand-in handlers
+    """
+
+    def __init__(
+        self,
+        corpus: Optional[SyntheticCorpus] = None,
+        embedding_latency_ms: float = 0.0,
+        chat_latency_ms: float = 0.0,
+        rpc_latency_ms: float = 0.0,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0
+    ):
+        self.corpus = corpus or SyntheticCorpus(0)
+        self.embedding_latency_ms = embedding_latency_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.rpc_latency_ms = rpc_latency_ms
+        # OpenAI-style limits for the embeddings/chat endpoints; 0 disables them
+        self.request_budget = Budget(requests_per_minute)
+        self.token_budget = Budget(tokens_per_minute)
+        self.request_counts: Dict[str, int] = {}
+        # Rows written through POST /fashion_embeddings, keyed by id
+        self.stored: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def admit(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """
+        Charge one request against the rate limits; returns whether it is
+        allowed and the x-ratelimit-* headers to send back
+        """
+        with self.lock:
+            now = time.monotonic()
+            request_wait = self.request_budget.wait_time(1, now)
+            token_wait = self.token_budget.wait_time(tokens, now)
+            allowed = request_wait <= 0 and token_wait <= 0
+            if allowed:
+                self.request_budget.take(1)
+                self.token_budget.take(tokens)
+
+            headers = {}
+            for kind, budget in (("requests", self.request_budget), ("tokens", self.token_budget)):
+                if not budget.capacity:
+                    continue
+                headers[f"x-ratelimit-limit-{kind}"] = str(int(budget.capacity))
+                headers[f"x-ratelimit-remaining-{kind}"] = str(max(int(budget.level), 0))
+                reset = (budget.capacity - budget.level) * 60 / budget.capacity
+                headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+            if not allowed:
+                headers["retry-after-ms"] = str(int(max(request_wait, token_wait) * 1000) + 1)
+            return allowed, headers
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Routes OpenAI-style and PostgREST-style requests to fake responses
+    """
+
+    config: StubConfig = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def send_json(self, payload, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_rate_limited(self, headers: Dict[str, str]):
+        self.config.count("rate_limited")
+        self.send_json({
+            "error": {
+                "message": "Rate limit reached (stand-in server)",
+                "type": "requests",
+                "code": "rate_limit_exceeded"
+            }
+        }, status=429, headers=headers)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self.read_json()
+
+        if path.endswith("/embeddings"):
+            inputs = body.get("input")
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            allowed, headers = self.config.admit(sum(len(text) // 4 + 1 for text in inputs))
+            if not allowed:
+                self.send_rate_limited(headers)
+                return
+            self.config.count("embeddings")
+            time.sleep(self.config.embedding_latency_ms / 1000)
+            self.send_json({
+                "object": "list",
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": self.config.corpus.embed(text).tolist()
+                    }
+                    for i, text in enumerate(inputs)
+                ],
+                "model": body.get("model"),
+                "usage": {"prompt_tokens": sum(len(text) // 4 + 1 for text in inputs)}
+            }, headers=headers)
+
+        elif path.endswith("/chat/completions"):
+            prompt_tokens = sum(len(message.get("content", "")) // 4 + 1 for message in body.get("messages", []))
+            allowed, headers = self.config.admit(prompt_tokens + int(body.get("max_tokens") or 0))
+            if not allowed:
+                self.send_rate_limited(headers)
+                return
+            self.config.count("chat")
+            time.sleep(self.config.chat_latency_ms / 1000)
+            self.send_json({
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {
+                        "role": "assistant",
+                        "content": "1. Try a tailored neutral blazer with wide-leg trousers."
+                    },
+                    "finish_reason": "stop"
+                }]
+            }, headers=headers)
+
+        elif path.endswith("/rpc/match_fashion_trends") or path.endswith("/rpc/match_fashion_trends_filtered"):
+            self.config.count("rpc")
+            time.sleep(self.config.rpc_latency_ms / 1000)
+            self.send_json(self.config.corpus.search(
+                body["query_embedding"],
+                float(body.get("match_threshold", 0.3)),
+                int(body.get("match_count", 5)),
+                category=body.get("filter_category"),
+                season=body.get("filter_season")
+            ))
+
+        elif path.endswith("/rpc/match_fashion_trends_batch"):
+            self.config.count("rpc")
+            time.sleep(self.config.rpc_latency_ms / 1000)
+            rows = []
+            # Embeddings arrive in pgvector's text form, '[0.1,0.2,...]'
+            for query_index, embedding in enumerate(body["query_embeddings"]):
+                for row in self.config.corpus.search(
+                    json.loads(embedding),
+                    float(body.get("match_threshold", 0.3)),
+                    int(body.get("match_count", 5))
+                ):
+                    row["query_index"] = query_index
+                    rows.append(row)
+            self.send_json(rows)
+
+        elif path.endswith("/fashion_embeddings"):
+            # insert / upsert keyed like the table's unique columns
+            self.config.count("upsert")
+            time.sleep(self.config.rpc_latency_ms / 1000)
+            rows = body if isinstance(body, list) else [body]
+            with self.config.lock:
+                for row in rows:
+                    row_id = row.get("content_hash") or row.get("id") or f"generated-{len(self.config.stored)}"
+                    self.config.stored[row_id] = row
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        else:
+            self.send_json({"error": f"Unknown endpoint {path}"}, status=404)
+
+    def do_GET(self):
+        # postgrest-py sends an empty JSON body with GET requests; drain it so
+        # the keep-alive connection stays in sync
+        self.read_json()
+        parsed = urlparse(self.path)
+        if not parsed.path.endswith("/fashion_embeddings"):
+            self.send_json({"error": f"Unknown endpoint {parsed.path}"}, status=404)
+            return
+
+        self.config.count("select")
+        time.sleep(self.config.rpc_latency_ms / 1000)
+        query = parse_qs(parsed.query)
+
+        # content_hash=in.(a,b,...) looks up rows written through POST
+        if "content_hash" in query:
+            wanted = set(query["content_hash"][0][len("in.("):-1].split(","))
+            with self.config.lock:
+                matches = [
+                    {"content_hash": row["content_hash"]}
+                    for row in self.config.stored.values()
+                    if row.get("content_hash") in wanted
+                ]
+            self.send_json(matches)
+            return
+
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["1000"])[0])
+        select = query.get("select", ["*"])[0]
+        include_embedding = select == "*" or "embedding" in select.split(",")
+
+        end = min(offset + limit, self.config.corpus.rows)
+        self.send_json([
+            self.config.corpus.row(index, include_embedding)
+            for index in range(offset, end)
+        ])
+
+
+def start_stub_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the stand-in server in a background thread
+    Use server.server_address to find the port when port=0
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# Run the stand-in server on its own
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local OpenAI/Supabase stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--rpc-latency-ms", type=float, default=10)
+    parser.add_argument("--requests-per-minute", type=int, default=0,
+                        help="Answer OpenAI-style calls above this rate with 429 (0 = unlimited)")
+    parser.add_argument("--tokens-per-minute", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        SyntheticCorpus(args.rows, args.dimensions),
+        embedding_latency_ms=args.embedding_latency_ms,
+        chat_latency_ms=args.chat_latency_ms,
+        rpc_latency_ms=args.rpc_latency_ms,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute
+    )
+    server = start_stub_server(config, port=args.port)
+    base = f"http://127.0.0.1:{args.port}"
+    print(f"Stand-in server running with {args.rows} synthetic trends")
+    print(f"   export OPENAI_BASE_URL={base}/v1")
+    print(f"   export SUPABASE_URL={base}")
+    print(f"   export SUPABASE_SERVICE_ROLE_KEY={STUB_API_KEY}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
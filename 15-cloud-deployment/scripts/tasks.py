@@ -4,10 +4,15 @@ This file defines background tasks that can be triggered asynchronously.
 Tasks are decorated with @celery_app.task() to register them with Celery.
 """
 
+from celery import chord, group
 from celery_app import celery_app
+import os
 import time
 import json
 from datetime import datetime
+from typing import List, Dict
+
+import requests
 
 # Import our scraping functions
 try:
@@ -30,6 +35,11 @@ except ImportError:
             {"title": "Sustainable Fashion Guide", "url": "https://example.com/2"}
         ]
 
+# Scrape -> embed -> index workflow: trends per embedding subtask, and the
+# API endpoint that makes newly stored trends searchable right away
+WORKFLOW_EMBED_CHUNK_SIZE = int(os.getenv("WORKFLOW_EMBED_CHUNK_SIZE", "200"))
+INDEX_REFRESH_URL = os.getenv("RAG_INDEX_REFRESH_URL", "http://localhost:8000/api/index/refresh")
+
 
 @celery_app.task(name='scrape_trends_task')
 def scrape_trends_task():
@@ -88,18 +98,23 @@ def scrape_fashion_news_task():
     Background task to scrape only fashion news.
     """
     print("[Celery Task] Starting fashion news scraping...")
+    start_time = time.time()
     
     try:
         news = scrape_fashion_news()
         return {
             "status": "success",
+            "source": "fashion_news",
             "timestamp": datetime.now().isoformat(),
+            "started_at": start_time,
+            "execution_time_seconds": round(time.time() - start_time, 2),
             "data": news,
             "count": len(news)
         }
     except Exception as e:
         return {
             "status": "error",
+            "started_at": start_time,
             "error": str(e)
         }
 
@@ -110,15 +125,40 @@ def scrape_makeup_products_task():
     Background task to scrape only makeup products.
     """
     print("[Celery Task] Starting makeup products scraping...")
+    start_time = time.time()
     
     try:
         products = scrape_makeup_products()
         return {
             "status": "success",
+            "source": "makeup_products",
             "timestamp": datetime.now().isoformat(),
+            "started_at": start_time,
+            "execution_time_seconds": round(time.time() - start_time, 2),
             "data": products,
             "count": len(products)
         }
+    except Exception as e:
+        return {
+            "status": "error",
+            "started_at": start_time,
+            "error": str(e)
+        }
+
+
+@celery_app.task(name='refit_projection_task')
+def refit_projection_task(method: str = "pca", dimensions: int = 256):
+    """
+    Maintenance task: refit the reduced-dimension projection used by
+    two-stage local search. Run it after large ingests.
+    """
+    print(f"[Celery Task] Refitting {method} projection to {dimensions} dimensions...")
+    
+    try:
+        from refit_projection import refit_projection
+        result = refit_projection(method=method, dimensions=dimensions)
+        result["timestamp"] = datetime.now().isoformat()
+        return result
     except Exception as e:
         return {
             "status": "error",
@@ -126,6 +166,171 @@ def scrape_makeup_products_task():
         }
 
 
+def scraped_to_trends(scrape_results: List[Dict]) -> List[Dict]:
+    """
+    Turn scrape task results (news headlines, makeup products) into trend
+    dicts in the shape create_embeddings expects
+    """
+    trends = []
+    for result in scrape_results:
+        if not isinstance(result, dict) or result.get("status") != "success":
+            continue
+        source = result.get("source", "")
+        for item in result.get("data", []):
+            if source == "makeup_products":
+                trends.append({
+                    "title": item.get("name", ""),
+                    "category": "Beauty",
+                    "season": "All Seasons",
+                    "description": f"{item.get('name', '')} {item.get('price', '')}".strip(),
+                    "url": item.get("link", ""),
+                    "source": source
+                })
+            else:
+                trends.append({
+                    "title": item.get("title", ""),
+                    "category": "Trends",
+                    "season": item.get("season", ""),
+                    "description": item.get("description", ""),
+                    "url": item.get("url") or item.get("link", ""),
+                    "source": source
+                })
+    return [trend for trend in trends if trend["title"]]
+
+
+@celery_app.task(name='dedupe_and_embed_task', bind=True)
+def dedupe_and_embed_task(self, scrape_results: List[Dict], chunk_size: int = WORKFLOW_EMBED_CHUNK_SIZE):
+    """
+    Workflow step 2: merge near-duplicate scraped trends, then replace this
+    task with a chord of chunked embedding subtasks and the index refresh
+    """
+    from create_embeddings import create_content_string
+    from dedup import deduplicate_trends
+    
+    scraped_at = time.time()
+    # The workflow starts when the first scraper runs, not when the canvas
+    # was built, so time spent queued before that is not counted
+    started_at = min(
+        (result["started_at"] for result in scrape_results
+         if isinstance(result, dict) and "started_at" in result),
+        default=scraped_at
+    )
+    trends = scraped_to_trends(scrape_results)
+    unique, dedup_report = deduplicate_trends(trends, create_content_string, mode="merge")
+    deduped_at = time.time()
+    
+    stages = {
+        "scrape": {
+            # Wall time from the first scraper starting until all finished
+            "seconds": round(scraped_at - started_at, 2),
+            "sources": len(scrape_results),
+            "failed_sources": sum(1 for result in scrape_results if result.get("status") != "success"),
+            "items": len(trends)
+        },
+        "dedup": {
+            "seconds": round(deduped_at - scraped_at, 2),
+            "items": len(unique),
+            "duplicates": dedup_report["duplicates"],
+            "dedup_ratio": dedup_report["dedup_ratio"]
+        }
+    }
+    print(f"[Celery Task] {len(trends)} scraped trends, {len(unique)} after dedup; "
+          f"embedding in chunks of {chunk_size}...")
+    
+    chunks = [unique[start:start + chunk_size] for start in range(0, len(unique), chunk_size)]
+    refresh = refresh_index_task.s(stages, started_at, deduped_at)
+    if not chunks:
+        return self.replace(refresh.clone(args=([],)))
+    return self.replace(chord([embed_trends_chunk_task.s(chunk) for chunk in chunks], refresh))
+
+
+@celery_app.task(name='embed_trends_chunk_task')
+def embed_trends_chunk_task(trends: List[Dict]):
+    """
+    Workflow step 3 (runs in parallel): embed and store one chunk of trends
+    in-process, reusing the worker's clients and connection pools
+    """
+    start_time = time.time()
+    
+    try:
+        from create_embeddings import embed_and_store
+        report = embed_and_store(trends, dedup_mode="off")
+        if report["error"]:
+            raise RuntimeError(report["error"])
+        return {
+            "status": "success",
+            "seconds": round(time.time() - start_time, 2),
+            "items": len(trends),
+            "written": report["writer"]["rows_written"],
+            "skipped_unchanged": report["skipped_unchanged"],
+            "failed": report["embed"]["errors"] + report["writer"]["rows_failed"]
+        }
+    except Exception as e:
+        print(f"[Celery Task] ✗ Embedding chunk failed: {str(e)}")
+        return {
+            "status": "error",
+            "seconds": round(time.time() - start_time, 2),
+            "items": len(trends),
+            "error": str(e)
+        }
+
+
+@celery_app.task(name='refresh_index_task')
+def refresh_index_task(chunk_results: List[Dict], stages: Dict, started_at: float, embed_started_at: float):
+    """
+    Workflow step 4: ask the API to pull the new rows into its local search
+    index, and report timings and counts for every stage
+    """
+    refresh_started_at = time.time()
+    stages["embed"] = {
+        "seconds": round(refresh_started_at - embed_started_at, 2),
+        "chunks": len(chunk_results),
+        "failed_chunks": sum(1 for result in chunk_results if result.get("status") != "success"),
+        "items": sum(result.get("items", 0) for result in chunk_results),
+        "written": sum(result.get("written", 0) for result in chunk_results),
+        "skipped_unchanged": sum(result.get("skipped_unchanged", 0) for result in chunk_results),
+        "failed": sum(result.get("failed", 0) for result in chunk_results)
+    }
+    
+    refresh = {"appended": 0}
+    if stages["embed"]["written"]:
+        try:
+            response = requests.post(INDEX_REFRESH_URL, timeout=60)
+            response.raise_for_status()
+            refresh = response.json()
+        except Exception as e:
+            # The API also polls for new rows, so this only delays search
+            print(f"[Celery Task] Index refresh failed: {str(e)}")
+            refresh = {"appended": 0, "error": str(e)}
+    stages["index_refresh"] = {"seconds": round(time.time() - refresh_started_at, 2), **refresh}
+    
+    total = time.time() - started_at
+    print(f"[Celery Task] ✓ Trend ingestion workflow finished in {total:.2f} seconds")
+    return {
+        "status": "success" if not stages["embed"]["failed_chunks"] else "partial",
+        "timestamp": datetime.now().isoformat(),
+        "execution_time_seconds": round(total, 2),
+        "stages": stages
+    }
+
+
+def trend_ingestion_workflow(chunk_size: int = WORKFLOW_EMBED_CHUNK_SIZE):
+    """
+    Scrape -> dedupe -> embed -> index as one Celery canvas:
+
+        group(scrapers) | dedupe_and_embed_task
+                              -> chord(embed chunks) | refresh_index_task
+
+    Usage:
+        result = trend_ingestion_workflow().delay()
+        result.get()  # per-stage timings and counts
+
+    Needs the Redis result backend (chords collect their results there).
+    """
+    scrapers = group(scrape_fashion_news_task.s(), scrape_makeup_products_task.s())
+    return chord(scrapers, dedupe_and_embed_task.s(chunk_size))
+
+
 # Example: Simple task for testing
 @celery_app.task(name='hello_task')
 def hello_task(name: str = "World"):
@@ -0,0 +1,214 @@
+"""
+Pipeline Tracing
+Span-style timings for each RAG stage, exported as Server-Timing headers
+and aggregated into per-stage latency histograms
+"""
+
+import bisect
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Optional
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+# Finished traces (with span attributes) kept for /api/metrics
+RECENT_TRACES = 20
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed stage of a request, with payload-size attributes
+    """
+
+    def __init__(self, name: str, parent: Optional[str] = None):
+        self.name = name
+        self.parent = parent
+        self.attributes: Dict = {}
+        self.start = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "duration_ms": round(self.duration_ms, 2),
+            "attributes": self.attributes
+        }
+
+
+class Trace:
+    """
+    Collects every span recorded while handling one request
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def add(self, span: Span):
+        # list.append is atomic, so concurrent generation threads can share a trace
+        self.spans.append(span)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def total_ms(self) -> float:
+        if self.duration_ms is not None:
+            return self.duration_ms
+        return (time.perf_counter() - self.start) * 1000
+
+    def stage_totals(self) -> Dict[str, Dict]:
+        """
+        Sum durations per stage (batch requests run some stages many times)
+        """
+        totals: Dict[str, Dict] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span.name, {"duration_ms": 0.0, "count": 0})
+            entry["duration_ms"] += span.duration_ms
+            entry["count"] += 1
+        return totals
+
+    def server_timing(self) -> str:
+        """
+        Format stage timings for the Server-Timing response header
+        e.g. embedding;dur=120.5, retrieval;dur=180.2, total;dur=912.4
+        """
+        entries = []
+        for name, entry in self.stage_totals().items():
+            value = f"{name};dur={entry['duration_ms']:.1f}"
+            if entry["count"] > 1:
+                value += f';desc="{entry["count"]} calls"'
+            entries.append(value)
+        entries.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict:
+        return {
+            "total_ms": round(self.total_ms(), 2),
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+
+class StageMetrics:
+    """
+    Per-stage latency histograms shared by every request in the process
+    """
+
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+
+    def observe(self, stage: str, duration_ms: float):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum_ms": 0.0}
+                self.stages[stage] = entry
+            entry["counts"][bisect.bisect_left(self.buckets, duration_ms)] += 1
+            entry["count"] += 1
+            entry["sum_ms"] += duration_ms
+
+    def snapshot(self) -> Dict:
+        """
+        Cumulative bucket counts per stage, in the style of a Prometheus histogram
+        """
+        labels = [f"le_{bound}ms" for bound in self.buckets] + ["le_inf"]
+        result = {}
+        with self.lock:
+            for stage, entry in self.stages.items():
+                cumulative = 0
+                buckets = {}
+                for label, count in zip(labels, entry["counts"]):
+                    cumulative += count
+                    buckets[label] = cumulative
+                result[stage] = {
+                    "count": entry["count"],
+                    "sum_ms": round(entry["sum_ms"], 2),
+                    "avg_ms": round(entry["sum_ms"] / entry["count"], 2),
+                    "buckets": buckets
+                }
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+
+
+stage_metrics = StageMetrics()
+recent_traces: deque = deque(maxlen=RECENT_TRACES)
+
+
+def recent_trace_dicts() -> List[Dict]:
+    """
+    The last finished requests, newest first, with every span's attributes
+    """
+    return [trace.to_dict() for trace in reversed(list(recent_traces))]
+
+
+@contextmanager
+def start_trace():
+    """
+    Begin collecting spans for one request
+    """
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        recent_traces.append(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block of code as a named stage
+    """
+    parent = _current_span.get()
+    current = Span(name, parent.name if parent else None)
+    current.attributes.update(attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        stage_metrics.observe(name, current.duration_ms)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def annotate(**attributes):
+    """
+    Attach payload sizes (or other details) to the span that is running now
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+def traced(name: str):
+    """
+    Decorator that records every call of a function as a span
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,143 @@
+"""
+Streaming Trend Loader
+Reads scraped trend files one trend at a time, so memory stays flat no
+matter how big the dump is and embedding can start right away
+
+Supported files:
+- JSON array:   [{"title": ...}, {"title": ...}]   (parsed incrementally)
+- JSON Lines:   one trend object per line
+- Either of the above compressed with gzip (.gz or gzip magic bytes)
+"""
+
+import gzip
+import io
+import json
+from typing import Dict, IO, Iterator
+
+CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+# Characters that can extend a JSON number ("5." or "5.5e" is still a prefix)
+NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+def open_text(path: str) -> IO[str]:
+    """
+    Open a file as text, transparently decompressing gzip
+    """
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC or path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def skip_whitespace(buffer: str, position: int) -> int:
+    while position < len(buffer) and buffer[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+def iter_json_array(f: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield the items of a top-level JSON array without loading all of it
+
+    Learning Note:
+    - Text is read in chunks into a small buffer
+    - json.JSONDecoder.raw_decode parses one item from the buffer; if the
+      item is cut off at the end of the buffer, another chunk is read
+    - A number is only taken once the text after it can't extend it
+    - Parsed text is dropped, so the buffer only ever holds about one item
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    expecting = "["
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    while True:
+        position = skip_whitespace(buffer, position)
+        if position >= len(buffer):
+            if eof or not fill():
+                raise ValueError("Unexpected end of file inside JSON array")
+            continue
+
+        char = buffer[position]
+        if expecting == "[":
+            if char != "[":
+                raise ValueError(f"Expected a JSON array, found {char!r}")
+            position += 1
+            expecting = "item_or_end"
+        elif expecting == "separator":
+            if char == ",":
+                position += 1
+                expecting = "item"
+            elif char == "]":
+                return
+            else:
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {char!r}")
+        elif char == "]" and expecting == "item_or_end":
+            return
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues past the buffer
+                if eof or not fill():
+                    raise
+                continue
+            is_number = isinstance(item, (int, float)) and not isinstance(item, bool)
+            if is_number and not eof and (end == len(buffer) or buffer[end] in NUMBER_CHARS):
+                # raw_decode stops at the chunk boundary or at a cut-off
+                # fraction/exponent; read on until the number is complete
+                if fill():
+                    continue
+            position = end
+            expecting = "separator"
+            yield item
+
+
+def iter_json_lines(f: IO[str]) -> Iterator:
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+
+
+def detect_format(path: str) -> str:
+    """
+    "array" if the first non-whitespace character is "[", else "lines"
+    """
+    with open_text(path) as f:
+        while True:
+            chunk = f.read(1024)
+            if not chunk:
+                return "lines"
+            stripped = chunk.lstrip()
+            if stripped:
+                return "array" if stripped[0] == "[" else "lines"
+
+
+def iter_trends(path: str) -> Iterator[Dict]:
+    """
+    Yield trends from a JSON array, JSON Lines or gzip-compressed file
+    """
+    file_format = detect_format(path)
+    with open_text(path) as f:
+        items = iter_json_array(f) if file_format == "array" else iter_json_lines(f)
+        for item in items:
+            if isinstance(item, dict):
+                yield item
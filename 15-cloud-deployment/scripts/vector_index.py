@@ -0,0 +1,713 @@
+"""
+Local Vector Index
+Keeps the fashion_embeddings table in memory so many query vectors can be
+scored at once with a single matrix-matrix product
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+# PostgREST returns at most 1000 rows per request by default
+PAGE_SIZE = 1000
+INDEX_COLUMNS = "id,content,title,category,season,metadata,embedding"
+
+# Rows scored per step, so quantized matrices are only widened a chunk at a time
+SCORE_CHUNK_ROWS = 65536
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# Two-stage search rescores limit x RERANK_FACTOR candidates at full dimension
+RERANK_FACTOR = 10
+# Where refit_projection.py stores the first-stage projection
+DEFAULT_PROJECTION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trend_projection.npz")
+
+
+def parse_embedding(value) -> List[float]:
+    """
+    PostgREST returns pgvector columns as a string like "[0.1,0.2,...]"
+    """
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale every row to unit length so a dot product equals cosine similarity
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, float]:
+    """
+    Store unit vectors as float32, float16 or int8
+
+    Learning Note:
+    - float16 halves memory with almost no change in ranking
+    - int8 quarters memory; every value is scaled so the largest component
+      maps to 127, and scores are scaled back when searching
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported index dtype '{dtype}', use one of {SUPPORTED_DTYPES}")
+    if dtype == "int8":
+        max_abs = float(np.abs(matrix).max()) if matrix.size else 1.0
+        scale = (max_abs or 1.0) / 127
+        return np.round(matrix / scale).astype(np.int8), scale
+    return matrix.astype(dtype), 1.0
+
+
+class Projection:
+    """
+    Maps 1536-dimension embeddings to a few hundred dimensions for the
+    first stage of a two-stage search
+
+    Learning Notes:
+    - "pca": the top principal directions of the stored embeddings, fitted
+      offline (see refit_projection.py); keeps most of the variance
+    - "truncate": keep the first N dimensions; only sensible for models
+      trained for it (e.g. text-embedding-3 with shortened dimensions)
+    - Reduced vectors are re-normalized so their dot product is a cosine
+    """
+
+    def __init__(self, method: str, dimensions: int, basis: Optional[np.ndarray] = None, metadata: Optional[Dict] = None):
+        if method not in ("pca", "truncate"):
+            raise ValueError(f"Unknown projection method '{method}'")
+        if method == "pca" and basis is None:
+            raise ValueError("A PCA projection needs a basis")
+        self.method = method
+        self.dimensions = dimensions
+        self.basis = None if basis is None else np.asarray(basis, dtype=np.float32)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def truncate(cls, dimensions: int) -> "Projection":
+        return cls("truncate", dimensions)
+
+    @classmethod
+    def fit_pca(cls, embeddings: np.ndarray, dimensions: int, sample: int = 50000, seed: int = 0) -> "Projection":
+        """
+        Fit on (a sample of) unit embeddings
+
+        Learning Note:
+        - The basis comes from the uncentered second-moment matrix, which
+          best preserves dot products (centering would drop the shared
+          direction all embeddings lean towards)
+        """
+        unit = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        if len(unit) > sample:
+            rng = np.random.default_rng(seed)
+            unit = unit[rng.choice(len(unit), sample, replace=False)]
+        moment = (unit.T.astype(np.float64) @ unit) / max(len(unit), 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(moment)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        explained = float(eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12))
+        metadata = {
+            "fitted_at": datetime.now(timezone.utc).isoformat(),
+            "rows": len(unit),
+            "source_dimensions": unit.shape[1],
+            "explained_variance": round(explained, 4)
+        }
+        return cls("pca", dimensions, eigenvectors[:, order], metadata)
+
+    def project(self, matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if self.method == "truncate":
+            reduced = matrix[:, :self.dimensions]
+        else:
+            reduced = matrix @ self.basis
+        return normalize_rows(reduced)
+
+    def save(self, path: str):
+        """
+        Store the projection as .npz next to the index
+        """
+        np.savez(
+            path,
+            method=self.method,
+            dimensions=self.dimensions,
+            basis=self.basis if self.basis is not None else np.zeros((0, 0), dtype=np.float32),
+            metadata=json.dumps(self.metadata)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        data = np.load(path)
+        basis = data["basis"]
+        return cls(
+            str(data["method"]),
+            int(data["dimensions"]),
+            basis if basis.size else None,
+            json.loads(str(data["metadata"]))
+        )
+
+    @classmethod
+    def load_optional(cls, path: Optional[str]) -> Optional["Projection"]:
+        """
+        The stored projection, or None if there isn't one yet
+        """
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            return cls.load(path)
+        except Exception as e:
+            print(f"[Index] Could not load projection {path}: {e}")
+            return None
+
+    def describe(self) -> str:
+        return f"{self.method}:{self.dimensions}"
+
+
+def load_trend_embeddings(client, table: str = "fashion_embeddings", page_size: int = PAGE_SIZE):
+    """
+    Load every stored trend and its embedding page by page
+    Returns (rows without the embedding column, embeddings matrix)
+    """
+    rows = []
+    vectors = []
+    start = 0
+
+    while True:
+        response = (
+            client.table(table)
+            .select(INDEX_COLUMNS)
+            .order("id")
+            .limit(page_size)
+            .offset(start)
+            .execute()
+        )
+        page = response.data or []
+
+        for row in page:
+            embedding = row.pop("embedding", None)
+            if not embedding:
+                continue
+            rows.append(row)
+            vectors.append(parse_embedding(embedding))
+
+        if len(page) < page_size:
+            break
+        start += page_size
+
+    print(f"[Index] Loaded {len(rows)} trend embeddings")
+    embeddings = np.array(vectors, dtype=np.float32) if vectors else np.zeros((0, 1536), dtype=np.float32)
+    return rows, embeddings
+
+
+def top_matches(
+    rows: List[Dict],
+    similarities: np.ndarray,
+    limit: int,
+    match_threshold: float,
+    candidates: np.ndarray = None
+) -> List[Dict]:
+    """
+    Best `limit` rows above the threshold for one query, highest first
+    `candidates` maps positions in `similarities` back to row numbers
+    """
+    if similarities.size == 0:
+        return []
+    k = min(limit, similarities.size)
+    # argpartition finds the k best columns without sorting the whole row
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+
+    matches = []
+    for position in top:
+        similarity = float(similarities[position])
+        if similarity <= match_threshold:
+            continue
+        row_idx = candidates[position] if candidates is not None else position
+        match = dict(rows[row_idx])
+        match["similarity"] = similarity
+        matches.append(match)
+    return matches
+
+
+class LocalTrendIndex:
+    """
+    Exact in-memory cosine search over fashion trend embeddings
+
+    Learning Notes:
+    - All trend vectors are stacked into one (rows x 1536) matrix
+    - A batch of queries becomes a (queries x 1536) matrix
+    - One matrix product scores every query against every trend at once
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict],
+        embeddings: np.ndarray,
+        dtype: str = "float32",
+        projection: Optional[Projection] = None,
+        rerank_factor: int = RERANK_FACTOR
+    ):
+        self.rows = rows
+        self.dtype = dtype
+        self.projection = projection
+        self.rerank_factor = rerank_factor
+        unit = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        self.matrix, self.scale = quantize(unit, dtype)
+        # First-stage vectors for two-stage search
+        self.reduced = projection.project(unit) if projection is not None and len(unit) else None
+
+    @classmethod
+    def from_supabase(cls, client, table: str = "fashion_embeddings", page_size: int = PAGE_SIZE, **kwargs):
+        """
+        Build the index from everything stored in fashion_embeddings
+        """
+        rows, embeddings = load_trend_embeddings(client, table, page_size)
+        return cls(rows, embeddings, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def memory_bytes(self) -> int:
+        reduced = self.reduced.nbytes if self.reduced is not None else 0
+        return int(self.matrix.nbytes + reduced)
+
+    def vectors(self) -> np.ndarray:
+        """
+        Stored unit vectors widened back to float32 (used when merging indexes)
+        """
+        if self.dtype == "float32":
+            return self.matrix
+        return self.matrix.astype(np.float32) * self.scale
+
+    def score(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every (unit) query against every stored trend
+        """
+        if self.dtype == "float32":
+            return queries @ self.matrix.T
+        scores = np.empty((len(queries), len(self.matrix)), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_CHUNK_ROWS):
+            chunk = self.matrix[start:start + SCORE_CHUNK_ROWS].astype(np.float32)
+            scores[:, start:start + len(chunk)] = queries @ chunk.T
+        return scores * self.scale
+
+    def search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 5,
+        match_threshold: float = 0.0
+    ) -> List[List[Dict]]:
+        """
+        Return the top `limit` trends above `match_threshold` for every query
+        """
+        if len(self.rows) == 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        if self.reduced is not None:
+            return self.search_two_stage(queries, limit, match_threshold)
+        similarities = self.score(queries)
+        return [
+            top_matches(self.rows, query_scores, limit, match_threshold)
+            for query_scores in similarities
+        ]
+
+    def search_two_stage(self, queries: np.ndarray, limit: int, match_threshold: float) -> List[List[Dict]]:
+        """
+        Shortlist candidates with the reduced vectors, then rerank them at
+        full dimension so the returned similarities are exact
+        """
+        reduced_scores = self.projection.project(queries) @ self.reduced.T
+        shortlist = min(len(self.rows), max(limit, limit * self.rerank_factor))
+
+        results = []
+        for query, query_scores in zip(queries, reduced_scores):
+            candidates = np.argpartition(-query_scores, shortlist - 1)[:shortlist]
+            similarities = (self.matrix[candidates].astype(np.float32) @ query) * self.scale
+            results.append(top_matches(self.rows, similarities, limit, match_threshold, candidates))
+        return results
+
+
+class IVFTrendIndex:
+    """
+    Approximate in-memory search with an inverted file (IVF) index
+
+    Learning Notes:
+    - Works like pgvector's ivfflat: vectors are grouped into `lists`
+      clusters with k-means, and a search only scans the `probes` clusters
+      whose centres are closest to the query
+    - More probes = better recall but slower searches
+    - Useful to tune lists/probes offline before changing the Postgres index
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict],
+        embeddings: np.ndarray,
+        lists: int = 100,
+        probes: int = 10,
+        iterations: int = 10,
+        dtype: str = "float32",
+        seed: int = 0
+    ):
+        self.rows = rows
+        self.probes = probes
+        self.dtype = dtype
+        unit = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        self.lists = max(1, min(lists, len(unit)))
+
+        self.centroids = self.train_centroids(unit, iterations, seed) if len(unit) else unit[:0]
+        assignments = self.assign(unit) if len(unit) else np.zeros(0, dtype=np.int64)
+
+        # Store each list's vectors contiguously so a probe is one slice
+        order = np.argsort(assignments, kind="stable")
+        self.row_ids = order
+        self.offsets = np.searchsorted(assignments[order], np.arange(self.lists + 1))
+        self.matrix, self.scale = quantize(unit[order], dtype)
+
+    @classmethod
+    def from_supabase(cls, client, table: str = "fashion_embeddings", page_size: int = PAGE_SIZE, **kwargs):
+        rows, embeddings = load_trend_embeddings(client, table, page_size)
+        return cls(rows, embeddings, **kwargs)
+
+    def train_centroids(self, unit: np.ndarray, iterations: int, seed: int) -> np.ndarray:
+        """
+        Spherical k-means: centres are re-normalized after every update
+        """
+        rng = np.random.default_rng(seed)
+        centroids = unit[rng.choice(len(unit), self.lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = self.assign(unit, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, unit)
+            filled = np.bincount(assignments, minlength=self.lists) > 0
+            centroids[filled] = normalize_rows(sums[filled])
+        return centroids
+
+    def assign(self, unit: np.ndarray, centroids: np.ndarray = None) -> np.ndarray:
+        centroids = self.centroids if centroids is None else centroids
+        assignments = np.empty(len(unit), dtype=np.int64)
+        for start in range(0, len(unit), SCORE_CHUNK_ROWS):
+            chunk = unit[start:start + SCORE_CHUNK_ROWS]
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def memory_bytes(self) -> int:
+        return int(self.matrix.nbytes + self.centroids.nbytes + self.row_ids.nbytes + self.offsets.nbytes)
+
+    def search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 5,
+        match_threshold: float = 0.0
+    ) -> List[List[Dict]]:
+        if len(self.rows) == 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        probes = min(self.probes, self.lists)
+        nearest_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :probes]
+
+        results = []
+        for query, lists in zip(queries, nearest_lists):
+            positions = np.concatenate([
+                np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+            ])
+            vectors = self.matrix[positions].astype(np.float32)
+            similarities = (vectors @ query) * self.scale
+            results.append(top_matches(
+                self.rows, similarities, limit, match_threshold, self.row_ids[positions]
+            ))
+        return results
+
+
+class LiveTrendIndex:
+    """
+    Exact local index that follows new and updated rows in fashion_embeddings
+
+    Learning Notes:
+    - A watermark (updated_at, id of the newest loaded row) is kept, and
+      refresh() only asks Supabase for rows at or after it, page by page;
+      009_add_updated_at.sql adds the column and the trigger that bumps it
+    - New vectors go into a small extra segment; searches scan every
+      segment and merge the results
+    - Segments are immutable and swapped in with one assignment, so
+      searches never wait for a refresh
+    - Once appended rows pass `fragmentation_threshold` (share of the base
+      snapshot) a background thread merges everything into a new snapshot
+    - The poll window starts `overlap_seconds` before the watermark so rows
+      from transactions that committed late are not missed; rows whose
+      version (watermark value) is already loaded are skipped
+    - A newer version of a known id (an upsert that re-embedded it) is
+      appended like a new row; searches drop matches from versions that are
+      no longer current, and the next rebuild removes them
+    - With `projection_path`, every refresh checks the file's mtime; a new
+      projection (refit_projection.py) is loaded and the snapshot rebuilt
+      so every segment's reduced vectors come from it
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str = "fashion_embeddings",
+        page_size: int = PAGE_SIZE,
+        dtype: str = "float32",
+        projection: Optional[Projection] = None,
+        fragmentation_threshold: float = 0.2,
+        max_segments: int = 16,
+        overlap_seconds: float = 5.0,
+        projection_path: Optional[str] = None,
+        watermark_column: str = "updated_at"
+    ):
+        self.client = client
+        self.table = table
+        self.page_size = page_size
+        self.dtype = dtype
+        self.projection = projection
+        self.projection_path = projection_path
+        self.projection_mtime: Optional[float] = None
+        if projection_path is not None and projection is None:
+            self.reload_projection()
+        self.fragmentation_threshold = fragmentation_threshold
+        self.max_segments = max_segments
+        self.overlap_seconds = overlap_seconds
+        self.watermark_column = watermark_column
+
+        self.segments: Tuple[LocalTrendIndex, ...] = ()
+        # id -> watermark value of the row version searches should return
+        self.versions: Dict[str, Optional[str]] = {}
+        self.watermark: Optional[Tuple[str, str]] = None
+        self.rebuilds = 0
+        self.rebuilding = False
+        # Serializes writers (refresh and snapshot swap); readers never take it
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.poll_thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def memory_bytes(self) -> int:
+        return sum(segment.memory_bytes() for segment in self.segments)
+
+    def appended_rows(self) -> int:
+        return sum(len(segment) for segment in self.segments[1:])
+
+    def stale_rows(self) -> int:
+        # Superseded versions still stored in some segment
+        return max(len(self) - len(self.versions), 0)
+
+    def is_current(self, row: Dict) -> bool:
+        version = self.versions.get(row["id"], row.get(self.watermark_column))
+        return version == row.get(self.watermark_column)
+
+    def has_stale_projection(self) -> bool:
+        return any(segment.projection is not self.projection for segment in self.segments)
+
+    def is_fragmented(self) -> bool:
+        if self.has_stale_projection():
+            return True
+        if len(self.segments) <= 1:
+            return False
+        if len(self.segments) > self.max_segments:
+            return True
+        changed_rows = self.appended_rows() + self.stale_rows()
+        return changed_rows > self.fragmentation_threshold * max(len(self.segments[0]), 1)
+
+    def fetch_since(self, since: Optional[str]) -> Tuple[List[Dict], List[List[float]]]:
+        """
+        Rows with watermark_column >= since whose version is not loaded yet,
+        oldest first
+        """
+        column = self.watermark_column
+        # Keyed by id: a row updated while paging shows up again further on,
+        # and only its newest version is kept
+        fetched: Dict[str, Tuple[Dict, List[float]]] = {}
+        offset = 0
+
+        while True:
+            query = self.client.table(self.table).select(f"{INDEX_COLUMNS},{column}")
+            if since is not None:
+                query = query.gte(column, since)
+            response = (
+                query.order(column)
+                .order("id")
+                .limit(self.page_size)
+                .offset(offset)
+                .execute()
+            )
+            page = response.data or []
+
+            for row in page:
+                embedding = row.pop("embedding", None)
+                if not embedding:
+                    continue
+                if row["id"] in self.versions and self.versions[row["id"]] == row.get(column):
+                    continue
+                fetched.pop(row["id"], None)
+                fetched[row["id"]] = (row, parse_embedding(embedding))
+
+            if len(page) < self.page_size:
+                break
+            offset += self.page_size
+
+        rows = [row for row, _ in fetched.values()]
+        vectors = [vector for _, vector in fetched.values()]
+        return rows, vectors
+
+    def poll_start(self) -> Optional[str]:
+        if self.watermark is None:
+            return None
+        newest = datetime.fromisoformat(self.watermark[0])
+        return (newest - timedelta(seconds=self.overlap_seconds)).isoformat()
+
+    def reload_projection(self) -> bool:
+        """
+        Load the projection file again if it changed since it was last read
+        """
+        try:
+            mtime = os.path.getmtime(self.projection_path)
+        except OSError:
+            return False
+        if mtime == self.projection_mtime:
+            return False
+        projection = Projection.load_optional(self.projection_path)
+        self.projection_mtime = mtime
+        if projection is None:
+            return False
+        # Segments built with the old projection are rebuilt by maybe_rebuild
+        self.projection = projection
+        print(f"[Index] Loaded projection {projection.describe()} from {self.projection_path}")
+        return True
+
+    def refresh(self) -> int:
+        """
+        Append rows inserted or updated since the watermark; returns how many
+        were added. The first call loads the whole table
+        """
+        with self.lock:
+            if self.projection_path is not None:
+                self.reload_projection()
+            rows, vectors = self.fetch_since(self.poll_start())
+            if rows:
+                segment = LocalTrendIndex(
+                    rows,
+                    np.array(vectors, dtype=np.float32),
+                    dtype=self.dtype,
+                    projection=self.projection
+                )
+                column = self.watermark_column
+                newest = max(rows, key=lambda row: (row.get(column) or "", row["id"]))
+                if newest.get(column):
+                    candidate = (newest[column], newest["id"])
+                    if self.watermark is None or candidate > self.watermark:
+                        self.watermark = candidate
+                # Segment first, versions second: until a new version is
+                # recorded, searches keep returning the old one
+                self.segments = self.segments + (segment,)
+                self.versions.update((row["id"], row.get(column)) for row in rows)
+
+        if rows:
+            print(f"[Index] Appended {len(rows)} trend embeddings ({len(self)} total)")
+        # Also rebuilds segments left on a replaced projection
+        self.maybe_rebuild()
+        return len(rows)
+
+    def maybe_rebuild(self):
+        """
+        Start a background snapshot rebuild if too many rows were appended
+        """
+        with self.lock:
+            if self.rebuilding or not self.is_fragmented():
+                return
+            self.rebuilding = True
+            segments = self.segments
+        threading.Thread(target=self.rebuild, args=(segments,), daemon=True).start()
+
+    def rebuild(self, segments: Tuple[LocalTrendIndex, ...]):
+        """
+        Merge `segments` into one snapshot, dropping superseded row versions;
+        segments appended meanwhile are kept
+        """
+        try:
+            rows = []
+            vectors = []
+            for segment in segments:
+                keep = [i for i, row in enumerate(segment.rows) if self.is_current(row)]
+                rows.extend(segment.rows[i] for i in keep)
+                vectors.append(segment.vectors()[keep])
+            vectors = np.concatenate(vectors)
+            merged = LocalTrendIndex(rows, vectors, dtype=self.dtype, projection=self.projection)
+            with self.lock:
+                self.segments = (merged,) + self.segments[len(segments):]
+                self.rebuilds += 1
+            print(f"[Index] Rebuilt snapshot with {len(merged)} trend embeddings")
+        except Exception as e:
+            print(f"[Index] Snapshot rebuild failed: {e}")
+        finally:
+            self.rebuilding = False
+
+    def start_polling(self, interval_seconds: float):
+        """
+        Call refresh() every `interval_seconds` in a daemon thread
+        """
+        if self.poll_thread is not None:
+            return
+
+        def poll():
+            while not self.stop_event.wait(interval_seconds):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"[Index] Refresh failed: {e}")
+
+        self.poll_thread = threading.Thread(target=poll, daemon=True)
+        self.poll_thread.start()
+
+    def stop_polling(self):
+        self.stop_event.set()
+
+    def search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int = 5,
+        match_threshold: float = 0.0
+    ) -> List[List[Dict]]:
+        # Read the segment tuple once so a concurrent swap can't mix snapshots
+        segments = self.segments
+        if not segments:
+            return [[] for _ in query_embeddings]
+        stale = self.stale_rows()
+        if len(segments) == 1 and not stale:
+            return segments[0].search_batch(query_embeddings, limit, match_threshold)
+
+        # Superseded versions can take up to `stale` places in each segment's top list
+        per_segment = [
+            segment.search_batch(query_embeddings, limit + stale, match_threshold)
+            for segment in segments
+        ]
+        results = []
+        for matches in zip(*per_segment):
+            merged = [
+                match for segment_matches in matches for match in segment_matches
+                if self.is_current(match)
+            ]
+            merged.sort(key=lambda match: match["similarity"], reverse=True)
+            results.append(merged[:limit])
+        return results
+
+    def status(self) -> Dict:
+        return {
+            "rows": len(self),
+            "segments": len(self.segments),
+            "appended_rows": self.appended_rows(),
+            "stale_rows": self.stale_rows(),
+            "watermark": self.watermark[0] if self.watermark else None,
+            "rebuilds": self.rebuilds,
+            "rebuilding": self.rebuilding,
+            "projection": self.projection.describe() if self.projection else None
+        }